@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the study-buddy splitters.
+
+Parsing, import rewriting, validation and writing are measured against the
+checked-in bundles and against synthetic bundles of 10^2, 10^4 and 10^5
+sections produced by generate_bundle(). Run from the repository root:
+
+  python bench_study_buddy.py                          # real bundles + synthetic suite
+  python bench_study_buddy.py "study-buddy-app refactor.txt" --repeat 50
+  python bench_study_buddy.py --sizes 100,10000 --section-size 2048 --alias-density 0.5
+  python bench_study_buddy.py --no-write --json bench.json
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+from typing import Dict, List
+
+from study_buddy_core import (
+    APP_HEADER_PREFIX,
+    APP_IMPORT_PREFIXES,
+    IMPORT_ALIASES,
+    TEST_HEADER_PREFIX,
+    BundleSplitter,
+    ExtractionValidator,
+    SectionIndex,
+    default_route,
+    rewrite_imports,
+)
+
+# The consolidated bundles kept in the repository root
+REAL_BUNDLES = [
+    ('study-buddy-app newer.txt', APP_HEADER_PREFIX),
+    ('study-buddy-app refactor.txt', APP_HEADER_PREFIX),
+    ('study-buddy-testing.txt', TEST_HEADER_PREFIX),
+    ('study-buddy-testing refact.txt', TEST_HEADER_PREFIX),
+]
+
+DEFAULT_SIZES = (100, 10000, 100000)
+
+# Upper bound on bytes pushed through each in-memory benchmark, so large
+# bundles get fewer passes instead of running for minutes
+PASS_BUDGET_BYTES = 64 * 1024 * 1024
+
+
+def legacy_rewrite_imports(content: str) -> str:
+    """The chained re.sub implementation rewrite_imports replaced, kept as a baseline."""
+    patterns = [
+        (r"from\s+['\"]@utils/", "from '@/app/lib/"),
+        (r"from\s+['\"]@config/?", "from '@/app/lib/config"),
+        (r"from\s+['\"]@types/", "from '@/app/lib/types/"),
+        (r"from\s+['\"]@content/", "from '@/app/lib/content/"),
+        (r"from\s+['\"]@ui/alerts['\"]", "from '@/app/lib/ui/alerts'"),
+        (r"from\s+['\"]@ui/tokens['\"]", "from '@/app/lib/ui/tokens'"),
+        (r"from\s+['\"]@ui/", "from '@/app/lib/ui/"),
+        (r"from\s+['\"]@components/", "from '@/components/"),
+        (r"from\s+['\"]@assets/", "from '@/assets/"),
+    ]
+    for pat, repl in patterns:
+        content = re.sub(pat, repl, content)
+    content = content.replace("require('../assets/animations/", "require('../../assets/animations/")
+    return content
+
+
+def generate_bundle(output_file: str, sections: int, section_size: int = 1024, depth: int = 3,
+                    alias_density: float = 0.2, header_prefix: str = APP_HEADER_PREFIX, seed: int = 0) -> int:
+    """Write a synthetic bundle in the consolidated format and return its size in bytes.
+
+    Each section is a ``.ts``/``.tsx`` file roughly ``section_size`` bytes long,
+    placed ``depth`` directories deep (ten subdirectories per level). About
+    ``alias_density`` of its lines are imports through the aliases in
+    IMPORT_ALIASES; the rest are ordinary code lines.
+    """
+    rng = random.Random(seed)
+    aliases = sorted(IMPORT_ALIASES)
+    with open(output_file, 'w', encoding='utf-8', newline='\n') as f:
+        f.write('# Synthetic study-buddy bundle\n\n')
+        for i in range(sections):
+            dirs = [f"d{(i // 10 ** level) % 10}" for level in range(depth)]
+            ext = 'tsx' if i % 4 == 0 else 'ts'
+            path = '/'.join(['src', *dirs, f"module{i}.{ext}"])
+            f.write(f"{header_prefix}{path}\n```{ext}\n")
+            written = 0
+            line_no = 0
+            while written < section_size:
+                if rng.random() < alias_density:
+                    alias = rng.choice(aliases)
+                    line = f"import {{ item{line_no} }} from '{alias}{'' if alias == '@config' else 'shared/'}item{line_no}';\n"
+                else:
+                    line = f"export const value{line_no} = computeValue({line_no}, 'section-{i}');\n"
+                f.write(line)
+                written += len(line)
+                line_no += 1
+            f.write('```\n\n---\n\n')
+        return f.tell()
+
+
+def _passes(total_bytes: int, repeat: int) -> int:
+    return max(1, min(repeat, PASS_BUDGET_BYTES // max(total_bytes, 1)))
+
+
+def _timed(func, passes: int) -> float:
+    start = time.perf_counter()
+    for _ in range(passes):
+        func()
+    return (time.perf_counter() - start) / passes
+
+
+def _mb_s(nbytes: int, seconds: float) -> float:
+    return nbytes / seconds / (1024 * 1024) if seconds else float('inf')
+
+
+def _load_sections(input_file: str, header_prefix: str):
+    with SectionIndex(input_file, header_prefix) as index:
+        return [index.text(s) for s in index.scan() if s.has_content]
+
+
+def bench_parse(input_file: str, header_prefix: str, passes: int) -> float:
+    """Seconds per full header/fence scan of the bundle."""
+    def parse():
+        with SectionIndex(input_file, header_prefix) as index:
+            for _ in index.scan():
+                pass
+    return _timed(parse, passes)
+
+
+def bench_rewrite_pass(sections: List[str], passes: int) -> float:
+    """Seconds per single-pass rewrite over every section."""
+    def rewrite():
+        for content in sections:
+            rewrite_imports(content)
+    return _timed(rewrite, passes)
+
+
+def bench_validate(input_file: str, header_prefix: str, passes: int) -> float:
+    """Seconds per incremental validation (duplicates, imports, fences) of the bundle."""
+    def validate():
+        validator = ExtractionValidator('bench', APP_IMPORT_PREFIXES)
+        with SectionIndex(input_file, header_prefix) as index:
+            for section in index.scan():
+                validator.add(index, section)
+        validator.issues()
+    return _timed(validate, passes)
+
+
+def bench_write(input_file: str, header_prefix: str, workers: int = 0) -> float:
+    """Seconds for one full split into a fresh temporary directory."""
+    with tempfile.TemporaryDirectory(prefix='bench-study-buddy-') as tmp:
+        splitter = BundleSplitter(input_file, [default_route(header_prefix, os.path.join(tmp, 'out'))],
+                                  dry_run=False, use_manifest=False, workers=workers)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            splitter.run()
+        return time.perf_counter() - start
+
+
+def bench_rewrite(sections, repeat: int):
+    print(f"Import rewriting ({len(sections)} sections x {repeat}):")
+    for name, func in (('legacy (9x re.sub)', legacy_rewrite_imports), ('single pass', rewrite_imports)):
+        total = sum(len(s.encode('utf-8')) for s in sections)
+        elapsed = _timed(lambda: [func(content) for content in sections], repeat) * repeat
+        print(f"  {name:<20} {elapsed * 1000:8.1f} ms  {_mb_s(total * repeat, elapsed):8.1f} MB/s")
+
+
+def bench_bundle(name: str, input_file: str, header_prefix: str, repeat: int,
+                 write: bool = True, workers: int = 0) -> Dict[str, any]:
+    """Run every benchmark against one bundle and return the results."""
+    size = os.path.getsize(input_file)
+    passes = _passes(size, repeat)
+    sections = _load_sections(input_file, header_prefix)
+    content_bytes = sum(len(s.encode('utf-8')) for s in sections)
+
+    result = {'bundle': name, 'sections': len(sections), 'bytes': size, 'passes': passes}
+    result['parse_s'] = bench_parse(input_file, header_prefix, passes)
+    result['rewrite_s'] = bench_rewrite_pass(sections, passes)
+    result['validate_s'] = bench_validate(input_file, header_prefix, passes)
+    result['parse_mb_s'] = _mb_s(size, result['parse_s'])
+    result['rewrite_mb_s'] = _mb_s(content_bytes, result['rewrite_s'])
+    result['validate_mb_s'] = _mb_s(size, result['validate_s'])
+    if write:
+        result['write_s'] = bench_write(input_file, header_prefix, workers)
+        result['write_files_s'] = len(sections) / result['write_s']
+    return result
+
+
+def print_results(results: List[Dict[str, any]]):
+    print(f"{'bundle':<32} {'sections':>8} {'MB':>7} {'parse MB/s':>11} {'rewrite MB/s':>13} "
+          f"{'validate MB/s':>14} {'write files/s':>14}")
+    for r in results:
+        write = f"{r['write_files_s']:14.0f}" if 'write_files_s' in r else f"{'-':>14}"
+        print(f"{r['bundle']:<32} {r['sections']:>8} {r['bytes'] / (1024 * 1024):7.2f} {r['parse_mb_s']:11.1f} "
+              f"{r['rewrite_mb_s']:13.1f} {r['validate_mb_s']:14.1f} {write}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the study-buddy splitters')
+    parser.add_argument('input_file', nargs='?', help='Benchmark only this bundle (default: real bundles + synthetic suite)')
+    parser.add_argument('--header-prefix', default=APP_HEADER_PREFIX, help='Header prefix marking file sections')
+    parser.add_argument('--repeat', type=int, default=20, help='Maximum passes per in-memory benchmark (default: 20)')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='Comma-separated synthetic section counts (default: 100,10000,100000; empty to skip)')
+    parser.add_argument('--section-size', type=int, default=1024, help='Approximate bytes per synthetic section (default: 1024)')
+    parser.add_argument('--depth', type=int, default=3, help='Directory depth of synthetic sections (default: 3)')
+    parser.add_argument('--alias-density', type=float, default=0.2,
+                        help='Fraction of synthetic lines that are aliased imports (default: 0.2)')
+    parser.add_argument('--workers', type=int, default=0, help='Use the threaded pipeline for the write benchmark')
+    parser.add_argument('--no-write', action='store_true', help='Skip the benchmark that writes files to disk')
+    parser.add_argument('--json', metavar='PATH', help='Also write the results to PATH as JSON')
+    args = parser.parse_args()
+
+    write = not args.no_write
+    results = []
+    if args.input_file:
+        bench_rewrite(_load_sections(args.input_file, args.header_prefix), args.repeat)
+        print()
+        results.append(bench_bundle(os.path.basename(args.input_file), args.input_file, args.header_prefix,
+                                    args.repeat, write, args.workers))
+    else:
+        for bundle, prefix in REAL_BUNDLES:
+            if not os.path.exists(bundle):
+                print(f"⚠️  Skipping missing bundle: {bundle}", file=sys.stderr)
+                continue
+            results.append(bench_bundle(bundle, bundle, prefix, args.repeat, write, args.workers))
+
+        sizes = [int(n) for n in args.sizes.split(',') if n.strip()]
+        with tempfile.TemporaryDirectory(prefix='bench-study-buddy-') as tmp:
+            for count in sizes:
+                bundle = os.path.join(tmp, f"synthetic-{count}.txt")
+                generate_bundle(bundle, count, args.section_size, args.depth, args.alias_density)
+                results.append(bench_bundle(f"synthetic x{count}", bundle, APP_HEADER_PREFIX,
+                                            args.repeat, write, args.workers))
+                os.remove(bundle)
+
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
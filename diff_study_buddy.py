@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Section-level diff and patch between two revisions of a consolidated bundle.
+
+Each section is rewritten exactly as the splitter would write it and hashed;
+only sections whose hashes differ are decoded into unified diffs.
+
+  python diff_study_buddy.py "study-buddy-app newer.txt" "study-buddy-app refactor.txt"
+  python diff_study_buddy.py OLD.txt NEW.txt -o study-buddy --apply
+
+--apply writes only the added and modified files into the existing output
+tree and deletes the removed ones, instead of regenerating the whole tree.
+Files go through the splitter's directory sink, so links shared with a blob
+store (--blob-store) or a staged tree's previous copy are replaced, never
+written through.
+"""
+
+import os
+import sys
+import difflib
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from study_buddy_core import (
+    APP_HEADER_PREFIX,
+    BlobStore,
+    BundleSplitter,
+    ContentManifest,
+    DirectorySink,
+    default_route,
+    remove_empty_parents,
+)
+
+
+class BundleDiff:
+    """Added, removed and modified output paths between two bundles."""
+
+    def __init__(self, old: BundleSplitter, new: BundleSplitter):
+        self.old = old
+        self.new = new
+        old_digests = old.digests()
+        new_digests = new.digests()
+        self.added: List[str] = sorted(set(new_digests) - set(old_digests))
+        self.removed: List[str] = sorted(set(old_digests) - set(new_digests))
+        self.modified: List[str] = sorted(
+            path for path in set(old_digests) & set(new_digests)
+            if old_digests[path][0] != new_digests[path][0]
+        )
+        self._old = {path: info for path, (_, info) in old_digests.items()}
+        self._new = {path: info for path, (_, info) in new_digests.items()}
+
+    def unified_diff(self, path: str) -> List[str]:
+        old_lines = self.old.content(self._old[path]).splitlines(keepends=True)
+        new_lines = self.new.content(self._new[path]).splitlines(keepends=True)
+        return list(difflib.unified_diff(old_lines, new_lines, f"a/{path}", f"b/{path}"))
+
+    def apply(self, output_dir: str, sink: Optional[DirectorySink] = None) -> Dict[str, int]:
+        """Write the delta into ``output_dir`` through ``sink`` and keep its manifest (if any) in step."""
+        sink = sink or DirectorySink()
+        manifest = ContentManifest(output_dir)
+        has_manifest = os.path.exists(manifest.path)
+        manifest.current = dict(manifest.previous)
+
+        for path in self.added + self.modified:
+            data = self.new.content(self._new[path]).encode('utf-8')
+            sink.make_dir(str(Path(path).parent))
+            rel_path = os.path.relpath(path, output_dir)
+            manifest.check(rel_path, data)
+            sink.write(path, data)
+            manifest.stamp(rel_path)
+            print(f"{'Created' if path in self.added else 'Updated'} file: {path} ({len(data)} bytes)")
+
+        for path in self.removed:
+            try:
+                os.remove(path)
+                remove_empty_parents(path, output_dir)
+                print(f"Removed file: {path}")
+            except FileNotFoundError:
+                pass
+            manifest.current.pop(os.path.relpath(path, output_dir), None)
+
+        if has_manifest:
+            manifest.save()
+        return {'added': len(self.added), 'modified': len(self.modified), 'removed': len(self.removed)}
+
+
+def load_bundle(input_file: str, header_prefix: str, output_dir: str) -> BundleSplitter:
+    splitter = BundleSplitter(input_file, [default_route(header_prefix, output_dir)], dry_run=False)
+    splitter.parse_file()
+    return splitter
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare two consolidated study-buddy bundles section by section'
+    )
+    parser.add_argument('old_file', help='Previous bundle revision')
+    parser.add_argument('new_file', help='New bundle revision')
+    parser.add_argument('-o', '--output-dir', default='study-buddy', help='Output directory the bundles split into (default: study-buddy)')
+    parser.add_argument('--header-prefix', default=APP_HEADER_PREFIX, help=f'Header prefix marking file sections (default: {APP_HEADER_PREFIX})')
+    parser.add_argument('--stat', action='store_true', help='List changed paths only, without unified diffs')
+    parser.add_argument('--apply', action='store_true', help='Write the delta into the output directory')
+    parser.add_argument('--blob-store', metavar='DIR', help='With --apply, hard-link written files from the blob store in DIR')
+
+    args = parser.parse_args()
+
+    for input_file in (args.old_file, args.new_file):
+        if not os.path.exists(input_file):
+            print(f"❌ Error: Input file '{input_file}' not found!")
+            return 1
+
+    old = load_bundle(args.old_file, args.header_prefix, args.output_dir)
+    new = load_bundle(args.new_file, args.header_prefix, args.output_dir)
+    try:
+        diff = BundleDiff(old, new)
+
+        print(f"\nSection diff: {args.old_file} -> {args.new_file}")
+        print("=" * 60)
+        for label, paths in (('Added', diff.added), ('Removed', diff.removed), ('Modified', diff.modified)):
+            print(f"{label}: {len(paths)}")
+            for path in paths:
+                print(f"  {path}")
+
+        if not args.stat:
+            for path in diff.modified:
+                print()
+                sys.stdout.writelines(diff.unified_diff(path))
+
+        if args.apply:
+            print(f"\nApplying delta to {args.output_dir}...\n")
+            counts = diff.apply(args.output_dir, DirectorySink(BlobStore(args.blob_store) if args.blob_store else None))
+            print(f"\n[OK] Applied {counts['added']} added, {counts['modified']} modified, {counts['removed']} removed files")
+    finally:
+        old.index.close()
+        new.index.close()
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
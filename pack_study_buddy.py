@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Pack a split output tree back into the consolidated bundle format.
+
+The reverse of split_study_buddy.py: every file under the tree becomes a
+``## study-buddy/<path>`` section with a language-tagged fence, and imports
+rewritten by the splitter are mapped back to their source aliases, so that
+splitting the packed bundle reproduces the tree byte for byte.
+
+  python pack_study_buddy.py study-buddy -o "study-buddy-app newer.txt"
+  python pack_study_buddy.py study-buddy-tests --header-prefix "## study-buddy-tests/" -o study-buddy-testing.txt
+  python pack_study_buddy.py study-buddy --order-from "study-buddy-app newer.txt" -o -
+
+Files are read concurrently and the bundle is written in one buffered pass.
+"""
+
+import os
+import sys
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from study_buddy_core import APP_HEADER_PREFIX, SectionIndex, unalias_imports
+
+# Fence info strings used by the existing bundles, by file extension
+FENCE_LANGUAGES = {
+    '.ts': 'ts',
+    '.tsx': 'tsx',
+    '.js': 'javascript',
+    '.jsx': 'jsx',
+    '.json': 'json',
+    '.yml': 'yaml',
+    '.yaml': 'yaml',
+    '.md': 'markdown',
+    '.sh': 'bash',
+    '.py': 'python',
+}
+
+SECTION_SEPARATOR = '\n---\n\n'
+
+
+class BundlePacker:
+    """Collect the files of an output tree and write them as one bundle."""
+
+    def __init__(self, root: str, header_prefix: str = APP_HEADER_PREFIX,
+                 unalias: Optional[Callable[[str], str]] = None, order_from: Optional[str] = None,
+                 workers: int = 8):
+        self.root = root
+        self.header_prefix = header_prefix
+        self.unalias = unalias
+        self.order_from = order_from
+        self.workers = workers
+        self.warnings: List[str] = []
+
+    def walk(self) -> List[str]:
+        """Relative POSIX paths of every regular file under the root, sorted."""
+        paths = []
+        stack = ['']
+        while stack:
+            rel_dir = stack.pop()
+            with os.scandir(os.path.join(self.root, rel_dir)) as entries:
+                for entry in entries:
+                    rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(rel)
+                    elif entry.is_file(follow_symlinks=False):
+                        paths.append(rel)
+        paths.sort()
+        return paths
+
+    def order(self, paths: List[str]) -> List[str]:
+        """Keep the section order of ``order_from`` for known paths; new files follow, sorted."""
+        if not self.order_from:
+            return paths
+        remaining = set(paths)
+        ordered = []
+        with SectionIndex(self.order_from, self.header_prefix) as index:
+            for section in index.scan():
+                if section.path in remaining:
+                    ordered.append(section.path)
+                    remaining.discard(section.path)
+        return ordered + [path for path in paths if path in remaining]
+
+    def render(self, rel: str) -> str:
+        """Read one file and format it as a bundle section."""
+        try:
+            content = Path(self.root, rel).read_text(encoding='utf-8')
+        except UnicodeDecodeError:
+            raise ValueError(f"Cannot pack non-UTF-8 file: {rel}")
+        for line in content.split('\n'):
+            stripped = line.strip()
+            # Either would end the section early when the bundle is split
+            if stripped.startswith('```') or line.startswith(self.header_prefix):
+                raise ValueError(f"Cannot pack {rel}: line {line!r} would be read as bundle structure")
+            if stripped == '---':
+                self.warnings.append(f"'---' lines in {rel} are dropped when the bundle is split")
+        if self.unalias:
+            content = self.unalias(content)
+        # The splitter skips sections without content lines and always ends files with one newline
+        if not content.endswith('\n'):
+            content += '\n'
+        lang = FENCE_LANGUAGES.get(Path(rel).suffix, Path(rel).suffix.lstrip('.'))
+        return f"{self.header_prefix}{rel}\n```{lang}\n{content}```\n"
+
+    def pack(self, output) -> int:
+        """Write the bundle to the open text file ``output``; returns the number of sections."""
+        paths = self.order(self.walk())
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for i, section in enumerate(pool.map(self.render, paths)):
+                if i:
+                    output.write(SECTION_SEPARATOR)
+                output.write(section)
+        return len(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Pack a split study-buddy tree back into a consolidated bundle'
+    )
+    parser.add_argument('input_dir', nargs='?', default='study-buddy', help='Output tree to pack (default: study-buddy)')
+    parser.add_argument('-o', '--output', required=True, help='Bundle file to write ("-" for stdout)')
+    parser.add_argument('--header-prefix', default=APP_HEADER_PREFIX, help=f'Header prefix for each section (default: {APP_HEADER_PREFIX})')
+    parser.add_argument('--order-from', metavar='BUNDLE', help='Keep the section order of an existing bundle to minimise diffs')
+    parser.add_argument('--workers', type=int, default=8, help='Threads reading files concurrently (default: 8)')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.input_dir):
+        print(f"❌ Error: Input directory '{args.input_dir}' not found!")
+        return 1
+    if args.order_from and not os.path.exists(args.order_from):
+        print(f"❌ Error: Bundle '{args.order_from}' not found!")
+        return 1
+
+    # Only app sections have their imports rewritten by the splitter
+    unalias = unalias_imports if args.header_prefix == APP_HEADER_PREFIX else None
+    packer = BundlePacker(args.input_dir, args.header_prefix, unalias, args.order_from, args.workers)
+    log = sys.stderr if args.output == '-' else sys.stdout
+    try:
+        if args.output == '-':
+            count = packer.pack(sys.stdout)
+        else:
+            # Write beside the target and swap in, so a failed pack never truncates an existing bundle
+            tmp_path = f"{args.output}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8', newline='\n', buffering=1 << 20) as f:
+                    count = packer.pack(f)
+                os.replace(tmp_path, args.output)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+    except ValueError as e:
+        print(f"❌ Error: {e}", file=log)
+        return 1
+
+    for warning in packer.warnings:
+        print(f"[WARN] {warning}", file=log)
+    print(f"[OK] Packed {count} files from {args.input_dir} into {args.output}", file=log)
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
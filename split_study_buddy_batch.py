@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Split several consolidated bundles concurrently from one invocation.
+
+Each job is a bundle, an output directory and an optional header prefix
+(default ``## study-buddy/``); the prefix selects the usual rules, so app
+sections get their imports rewritten and test sections are copied verbatim.
+Jobs run in a process pool, one bundle per process, with DRY RUN by default.
+
+  python split_study_buddy_batch.py \\
+      --job "study-buddy-app newer.txt" study-buddy \\
+      --job study-buddy-testing.txt study-buddy-tests "## study-buddy-tests/" \\
+      --create
+
+A job file is a JSON list of objects with ``input_file``, ``output_dir`` and
+optionally ``header_prefix``:
+
+  [{"input_file": "study-buddy-testing.txt", "output_dir": "study-buddy-tests",
+    "header_prefix": "## study-buddy-tests/"}]
+
+With --blob-store DIR, every job hard-links its files from one shared
+content-addressed store, so identical files across the outputs are stored
+once; blobs no output links to any more are removed after the run.
+"""
+
+import io
+import os
+import json
+import time
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict
+
+from study_buddy_core import APP_HEADER_PREFIX, BlobStore, BundleSplitter, DirectorySink, Reporter, default_route
+
+
+def _run_job(job: Dict[str, any]) -> Dict[str, any]:
+    """Run one split in a worker process, capturing its console output."""
+    result = {'job': job, 'files': 0, 'unchanged': 0, 'error': None}
+    log = io.StringIO()
+    start = time.perf_counter()
+    route = default_route(job.get('header_prefix') or APP_HEADER_PREFIX, job['output_dir'])
+    with contextlib.redirect_stdout(log):
+        try:
+            # Job logs are only shown with -v or on failure; otherwise keep just warnings
+            reporter = Reporter('verbose' if job.get('verbose') else 'quiet')
+            store = BlobStore(job['blob_store']) if job.get('blob_store') and not job['dry_run'] else None
+            splitter = BundleSplitter(job['input_file'], [route], dry_run=job['dry_run'],
+                                      use_manifest=job['use_manifest'], prune=job['prune'], reporter=reporter,
+                                      sink=DirectorySink(store) if store else None)
+            result['files'] = splitter.run()
+            result['unchanged'] = splitter.unchanged_count
+            if store:
+                result['blobs'] = store.stats
+        except Exception as e:
+            result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = time.perf_counter() - start
+    result['log'] = log.getvalue()
+    return result
+
+
+def load_jobs(job_file: str) -> List[Dict[str, any]]:
+    with open(job_file, 'r', encoding='utf-8') as f:
+        jobs = json.load(f)
+    for job in jobs:
+        if 'input_file' not in job or 'output_dir' not in job:
+            raise ValueError(f"Job entries need 'input_file' and 'output_dir': {job}")
+    return jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Split several consolidated study-buddy bundles concurrently'
+    )
+    parser.add_argument('--job', action='append', nargs='+', default=[], metavar='ARG',
+                        help='INPUT_FILE OUTPUT_DIR [HEADER_PREFIX]; may be repeated')
+    parser.add_argument('--jobs-file', help='JSON file listing jobs')
+    parser.add_argument('-j', '--processes', type=int, default=None,
+                        help='Worker processes (default: one per CPU, capped at the job count)')
+    parser.add_argument('--dry-run', action='store_true', default=True, help='Show actions without creating files (default: True)')
+    parser.add_argument('--create', action='store_true', help='Actually create files (overrides --dry-run)')
+    parser.add_argument('--no-manifest', action='store_true', help='Rewrite every file instead of skipping unchanged ones')
+    parser.add_argument('--prune', action='store_true', help='Delete previously generated files no longer in the bundle')
+    parser.add_argument('--blob-store', metavar='DIR',
+                        help='Hard-link identical files across all outputs from one content-addressed store in DIR')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Print each job\'s full output')
+
+    args = parser.parse_args()
+    if args.create:
+        args.dry_run = False
+
+    jobs: List[Dict[str, any]] = []
+    if args.jobs_file:
+        jobs.extend(load_jobs(args.jobs_file))
+    for values in args.job:
+        if len(values) not in (2, 3):
+            parser.error(f"--job takes INPUT_FILE OUTPUT_DIR [HEADER_PREFIX], got: {values}")
+        job = {'input_file': values[0], 'output_dir': values[1]}
+        if len(values) == 3:
+            job['header_prefix'] = values[2]
+        jobs.append(job)
+    if not jobs:
+        parser.error('no jobs given (use --job or --jobs-file)')
+
+    output_dirs = [os.path.normpath(job['output_dir']) for job in jobs]
+    if len(set(output_dirs)) != len(output_dirs):
+        print("❌ Error: Several jobs write to the same output directory!")
+        return 1
+    missing = [job['input_file'] for job in jobs if not os.path.exists(job['input_file'])]
+    if missing:
+        print(f"❌ Error: Input file(s) not found: {', '.join(missing)}")
+        return 1
+
+    for job in jobs:
+        job.update(dry_run=args.dry_run, use_manifest=not args.no_manifest, prune=args.prune, verbose=args.verbose,
+                   blob_store=args.blob_store)
+
+    processes = min(args.processes or os.cpu_count() or 1, len(jobs))
+    print(f"{'[DRY RUN] ' if args.dry_run else ''}Splitting {len(jobs)} bundles with {processes} processes...\n")
+
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(_run_job, job) for job in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            job = result['job']
+            if args.verbose or result['error']:
+                print(result['log'])
+            status = f"FAILED ({result['error']})" if result['error'] else f"{result['files']} files"
+            if result['unchanged']:
+                status += f", {result['unchanged']} unchanged"
+            print(f"  {job['input_file']} -> {job['output_dir']}: {status} in {result['seconds']:.2f}s")
+    elapsed = time.perf_counter() - start
+
+    failed = [r for r in results if r['error']]
+    print("\nSummary:")
+    print(f"  Jobs: {len(results)} ({len(failed)} failed)")
+    print(f"  Files: {sum(r['files'] for r in results)} ({sum(r['unchanged'] for r in results)} unchanged)")
+    print(f"  Wall time: {elapsed:.2f}s (sum of job times: {sum(r['seconds'] for r in results):.2f}s)")
+    stats = [r['blobs'] for r in results if 'blobs' in r]
+    if stats:
+        # Jobs share the store, so collect garbage only once all of them are done
+        removed = BlobStore(args.blob_store).gc()
+        total = {key: sum(s[key] for s in stats) for key in stats[0]}
+        print(f"  Blob store: {total['blobs']} new blobs ({total['blob_bytes']:,} bytes), "
+              f"{total['hardlinks']} hard links, {total['reflinks']} reflinks, {total['copies']} copies, "
+              f"{removed} unreferenced blobs removed")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    exit(main())
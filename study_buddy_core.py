@@ -0,0 +1,2547 @@
+"""
+Shared splitting core for the study-buddy bundle splitters.
+
+A consolidated bundle is a markdown document whose file sections look like:
+
+  ## study-buddy/<relative/output/path>
+  ```<lang>
+  ...file contents...
+  ```
+
+BundleSplitter scans a bundle once and routes every section to the output
+directory registered for its header prefix, so a mixed document holding
+both app and test sections is split in a single pass. split_study_buddy.py
+and split_study_buddy_testing.py are thin front ends over this module.
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import mmap
+import time
+import queue
+import pickle
+import shutil
+import cProfile
+import hashlib
+import tarfile
+import zipfile
+import argparse
+import threading
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+APP_HEADER_PREFIX = '## study-buddy/'
+TEST_HEADER_PREFIX = '## study-buddy-tests/'
+
+# Legacy app paths that should be ignored (replaced by new organized structure)
+LEGACY_PATHS = frozenset([
+    'src/utils/constants.ts',
+    'src/utils/i18n.ts',
+    'src/utils/speech.ts',
+    'src/utils/photoManager.ts',
+    'src/utils/storage.ts',
+    'src/utils/audio.ts',
+    'src/utils/peerLines.ts',
+    'src/utils/voice.ts',
+    'App.tsx',
+])
+
+# Rewritten app imports that validation resolves against the extracted paths
+APP_IMPORT_PREFIXES = ('@/app/lib/', '@/components/')
+
+_NON_SPACE = re.compile(rb'\S')
+
+# End-of-stream marker passed between pipeline stages
+_DONE = object()
+
+# Source alias -> Expo Router target under the @/* alias. Aliases without a
+# trailing slash match the bare module as well as anything below it.
+IMPORT_ALIASES = {
+    '@utils/': '@/app/lib/',
+    '@config': '@/app/lib/config',
+    '@types/': '@/app/lib/types/',
+    '@content/': '@/app/lib/content/',
+    '@ui/': '@/app/lib/ui/',
+    '@components/': '@/components/',
+    '@assets/': '@/assets/',
+}
+
+# Relative requires fixed up only inside require(): the asset registry lives in
+# app/lib/assets/ and animations in assets/animations/
+REQUIRE_REWRITES = {
+    '../assets/animations/': '../../assets/animations/',
+}
+
+
+def _compile_rewriter(aliases: Dict[str, str], requires: Dict[str, str]):
+    targets = dict(aliases)
+    targets.update(requires)
+    alternatives = []
+    # Longest first so overlapping prefixes resolve to the most specific alias
+    for source in sorted(targets, key=len, reverse=True):
+        alt = re.escape(source)
+        if not source.endswith('/'):
+            alt += r"(?=[/'\"])"
+        alternatives.append(alt)
+    # Anchor on the quoted specifier (a cheap single-character scan) and check
+    # the import/require keyword before it only when a candidate is found.
+    pattern = re.compile(r"['\"](?P<spec>" + '|'.join(alternatives) + ")")
+    return pattern, targets
+
+
+_IMPORT_LEAD_RE = re.compile(r"\b(?:(?P<call>require|import)\s*\(\s*|(?:from|import)\s*)\Z")
+_IMPORT_LEAD_WINDOW = 64
+
+
+def _make_rewrite_match(targets: Dict[str, str], requires: Dict[str, str]) -> Callable[[re.Match], str]:
+    def rewrite_match(m: re.Match) -> str:
+        start = m.start()
+        lead = _IMPORT_LEAD_RE.search(m.string, max(0, start - _IMPORT_LEAD_WINDOW), start)
+        if not lead:
+            return m.group(0)
+        spec = m.group('spec')
+        if spec in requires and lead.group('call') != 'require':
+            return m.group(0)
+        return m.group(0)[0] + targets[spec]
+    return rewrite_match
+
+
+_IMPORT_RE, _IMPORT_TARGETS = _compile_rewriter(IMPORT_ALIASES, REQUIRE_REWRITES)
+_rewrite_match = _make_rewrite_match(_IMPORT_TARGETS, REQUIRE_REWRITES)
+
+# The inverse mapping, used when packing a split tree back into a bundle.
+# Rewritten specifiers map back to the alias that produces them again, so
+# pack -> split reproduces the split output byte for byte.
+_UNALIAS_REQUIRES = {target: source for source, target in REQUIRE_REWRITES.items()}
+_UNALIAS_RE, _UNALIAS_TARGETS = _compile_rewriter(
+    {target: source for source, target in IMPORT_ALIASES.items()}, _UNALIAS_REQUIRES)
+_unalias_match = _make_rewrite_match(_UNALIAS_TARGETS, _UNALIAS_REQUIRES)
+
+
+def rewrite_specifier(spec: str) -> str:
+    """Map a single module specifier through IMPORT_ALIASES."""
+    m = _IMPORT_RE.match("'" + spec)
+    if m and m.group('spec') in IMPORT_ALIASES:
+        return IMPORT_ALIASES[m.group('spec')] + spec[len(m.group('spec')):]
+    return spec
+
+
+def rewrite_imports(content: str, counts: Optional[Dict[str, int]] = None) -> str:
+    """Rewrite aliased module specifiers in a single pass.
+
+    Covers ``import ... from``, ``export ... from``, side-effect ``import``,
+    ``require()`` and dynamic ``import()``; the original quote style is kept.
+    If ``counts`` is given, substitutions are tallied into it per source alias.
+    """
+    if counts is None:
+        return _IMPORT_RE.sub(_rewrite_match, content)
+
+    def counting_match(m: re.Match) -> str:
+        replacement = _rewrite_match(m)
+        if replacement != m.group(0):
+            counts[m.group('spec')] = counts.get(m.group('spec'), 0) + 1
+        return replacement
+
+    return _IMPORT_RE.sub(counting_match, content)
+
+
+def unalias_imports(content: str) -> str:
+    """Reverse rewrite_imports: map rewritten specifiers back to their source aliases."""
+    return _UNALIAS_RE.sub(_unalias_match, content)
+
+
+class Section:
+    """Location of one embedded file inside a bundle.
+
+    Offsets are byte positions into the input file; ``line_start`` is the
+    1-based line number of the section header.
+    """
+    __slots__ = ('prefix', 'path', 'line_start', 'header_offset', 'open_fence', 'close_fence',
+                 'content_start', 'content_end', 'has_content', 'has_separator')
+
+    def __init__(self, prefix: str, path: str, line_start: int, header_offset: int):
+        self.prefix = prefix
+        self.path = path
+        self.line_start = line_start
+        self.header_offset = header_offset
+        self.open_fence: Optional[int] = None
+        self.close_fence: Optional[int] = None
+        self.content_start: Optional[int] = None
+        self.content_end: Optional[int] = None
+        self.has_content = False
+        self.has_separator = False
+
+    @property
+    def size(self) -> int:
+        """Raw byte size of the fenced content."""
+        if self.content_start is None:
+            return 0
+        return self.content_end - self.content_start
+
+    def shift(self, offset: int, lines: int):
+        """Move the section by ``offset`` bytes and ``lines`` lines, e.g. after an edit above it."""
+        self.line_start += lines
+        self.header_offset += offset
+        if self.open_fence is not None:
+            self.open_fence += offset
+            self.content_start += offset
+            self.content_end += offset
+        if self.close_fence is not None:
+            self.close_fence += offset
+
+
+class SectionIndex:
+    """One-pass index of the file sections in a consolidated bundle.
+
+    The index sits over a read-only memory map of the input, so building it
+    never copies section bodies; content is only decoded by :meth:`text`.
+    Several header prefixes can be indexed in the same scan; each section
+    records the prefix it was found under.
+    """
+
+    def __init__(self, input_file: str, header_prefixes: Union[str, Iterable[str]] = APP_HEADER_PREFIX,
+                 path_filter: Optional[Callable[[str], bool]] = None, data: Optional[bytes] = None):
+        self.input_file = input_file
+        # A snapshot of the input to index instead of mapping the file, for inputs
+        # that may be rewritten in place while indexed (a shrinking mapping faults)
+        self.data = data
+        if isinstance(header_prefixes, str):
+            header_prefixes = (header_prefixes,)
+        # Longest first so a prefix never shadows a more specific one
+        self.header_prefixes = tuple(sorted((p.encode('utf-8') for p in header_prefixes), key=len, reverse=True))
+        # Finds the next header under any prefix in one search, for skipping rejected sections
+        self._header_re = re.compile(b'\n(?:' + b'|'.join(map(re.escape, self.header_prefixes)) + b')')
+        # Sections whose path it rejects are skipped at the header, content unread
+        self.path_filter = path_filter
+        self.sections: List[Section] = []
+        # (prefix, path, header offset) of every section rejected by path_filter
+        self.skipped: List[Tuple[str, str, int]] = []
+        self.line_number = 0
+        self._file = None
+        self._mm = None
+
+    def open(self):
+        if self._mm is None and self.data is not None:
+            self._mm = self.data
+        elif self._mm is None:
+            self._file = open(self.input_file, 'rb')
+            if os.fstat(self._file.fileno()).st_size:
+                self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                # Empty files cannot be mapped
+                self._mm = b''
+        return self
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        if self._file:
+            self._file.close()
+        self._mm = None
+        self._file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def scan(self, start: int = 0, stop: Optional[int] = None, line_number: int = 0) -> Iterator[Section]:
+        """Index the bundle, yielding each section as soon as it is complete.
+
+        Every header is yielded, including ones without a content block; check
+        ``has_content`` before materializing. The first fence after a header
+        opens the content and the second closes it; ``---`` lines inside the
+        content are dropped when it is materialized.
+
+        ``start`` and ``stop`` limit the scan to the headers between two header
+        offsets, with ``line_number`` lines before ``start``; ``sections`` and
+        ``skipped`` then only hold that stretch.
+        """
+        self.open()
+        mm = self._mm
+        prefixes = self.header_prefixes
+        path_filter = self.path_filter
+        self.sections = []
+        self.skipped = []
+        self.line_number = line_number
+        current: Optional[Section] = None
+        fences = 0
+        pos = start
+        size = len(mm) if stop is None else stop
+
+        while pos < size:
+            end = mm.find(b'\n', pos) + 1 or size
+            line = mm[pos:end]
+            self.line_number += 1
+
+            if line.startswith(prefixes):
+                if current is not None:
+                    self._finish(current, pos)
+                    yield current
+                prefix = next(p for p in prefixes if line.startswith(p))
+                path = line[len(prefix):].strip().decode('utf-8')
+                if path_filter is not None and not path_filter(path):
+                    # Headers are recognised anywhere, so jump straight to the next one
+                    self.skipped.append((prefix.decode('utf-8'), path, pos))
+                    current = None
+                    next_header = self._next_header(end)
+                    self.line_number += self._count_lines(end, next_header)
+                    pos = next_header
+                    continue
+                current = Section(prefix.decode('utf-8'), path, self.line_number, pos)
+                self.sections.append(current)
+                fences = 0
+            elif current is not None:
+                stripped = line.strip()
+                if stripped == b'---':
+                    if fences == 1:
+                        current.has_separator = True
+                elif stripped.startswith(b'```'):
+                    fences += 1
+                    if fences == 1:
+                        current.open_fence = pos
+                        current.content_start = end
+                    elif fences == 2:
+                        current.close_fence = pos
+                        current.content_end = pos
+                        yield current
+                        current = None
+                elif fences == 1:
+                    current.has_content = True
+            pos = end
+
+        # Last section may be missing its closing fence (or ends at ``stop``)
+        if current is not None:
+            self._finish(current, size)
+            yield current
+
+    def _next_header(self, start: int) -> int:
+        """Offset of the first header line at or after ``start`` (the end of the bundle if none)."""
+        match = self._header_re.search(self._mm, start - 1)
+        return match.start() + 1 if match else len(self._mm)
+
+    def _count_lines(self, start: int, stop: int, window: int = 1 << 16) -> int:
+        """Newlines in ``[start, stop)``, counted in fixed windows so a skipped body is never copied whole."""
+        mm = self._mm
+        if isinstance(mm, bytes):
+            return mm.count(b'\n', start, stop)
+        count = 0
+        while start < stop:
+            end = min(start + window, stop)
+            count += mm[start:end].count(b'\n')
+            start = end
+        return count
+
+    def build(self) -> List[Section]:
+        """Index the whole bundle and return every section."""
+        for _ in self.scan():
+            pass
+        return self.sections
+
+    @staticmethod
+    def _finish(section: Section, pos: int):
+        # An unclosed block runs up to the next header (or end of file)
+        if section.content_start is not None and section.content_end is None:
+            section.content_end = pos
+
+    def text(self, section: Section) -> str:
+        """Decode a section's content exactly as a line-by-line text read would."""
+        content = self._mm[section.content_start:section.content_end].decode('utf-8')
+        if '\r' in content:
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+        if section.has_separator:
+            content = '\n'.join(l for l in content.split('\n') if l.strip() != '---')
+        return content
+
+    def head(self, section: Section, limit: int) -> str:
+        """Decode roughly the first ``limit`` characters of a section, for previews."""
+        if section.has_separator or section.size <= limit * 4:
+            return self.text(section)
+        raw = self._mm[section.content_start:section.content_start + limit * 4]
+        return raw.decode('utf-8', errors='ignore').replace('\r\n', '\n')
+
+    def finditer(self, pattern: re.Pattern, section: Section) -> Iterator[re.Match]:
+        """Run a bytes pattern over a section's raw content without copying it."""
+        return pattern.finditer(self._mm, section.content_start, section.content_end)
+
+    def digest(self, section: Section) -> str:
+        """Hash of a section's raw content bytes, computed over the mapping without copying."""
+        return hashlib.blake2b(memoryview(self._mm)[section.content_start:section.content_end]).hexdigest()
+
+    def is_blank(self, section: Section) -> bool:
+        """True if the section content is whitespace only, checked without copying."""
+        if section.has_separator:
+            return not self.text(section).strip()
+        return _NON_SPACE.search(self._mm, section.content_start, section.content_end) is None
+
+
+def remove_empty_parents(file_path: str, root: str):
+    """Remove the directories above a deleted file that are now empty, up to ``root``."""
+    root = os.path.abspath(root)
+    parent = os.path.dirname(os.path.abspath(file_path))
+    while parent != root and parent.startswith(root + os.sep):
+        try:
+            os.rmdir(parent)
+        except OSError:
+            break
+        parent = os.path.dirname(parent)
+
+
+def _common_prefix(a: bytes, b: bytes, window: int = 1 << 16) -> int:
+    """Length of the longest common prefix of two byte strings.
+
+    Compared a window at a time (slice comparison is a memcmp), then narrowed
+    down by bisection inside the first window that differs.
+    """
+    n = min(len(a), len(b))
+    pos = 0
+    while pos < n:
+        end = min(pos + window, n)
+        if a[pos:end] != b[pos:end]:
+            lo, hi = pos, end
+            while hi - lo > 1:
+                mid = (lo + hi) // 2
+                if a[lo:mid] == b[lo:mid]:
+                    lo = mid
+                else:
+                    hi = mid
+            return lo
+        pos = end
+    return n
+
+
+def _common_suffix(a: bytes, b: bytes, limit: int, window: int = 1 << 16) -> int:
+    """Length of the longest common suffix of two byte strings, at most ``limit``."""
+    len_a, len_b = len(a), len(b)
+    pos = 0
+    while pos < limit:
+        end = min(pos + window, limit)
+        if a[len_a - end:len_a - pos] != b[len_b - end:len_b - pos]:
+            lo, hi = pos, end
+            while hi - lo > 1:
+                mid = (lo + hi) // 2
+                if a[len_a - mid:len_a - lo] == b[len_b - mid:len_b - lo]:
+                    lo = mid
+                else:
+                    hi = mid
+            return lo
+        pos = end
+    return limit
+
+
+def _first_section_at(sections: List[Section], offset: int) -> int:
+    """Index of the first section whose header is at or after ``offset`` (sections are in bundle order)."""
+    lo, hi = 0, len(sections)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if sections[mid].header_offset < offset:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class PathTrie:
+    """Directory tree of the files a split produces, with per-directory rollups.
+
+    The first level holds each route's output directory as a single node; the
+    levels below follow the section paths. Built while the bundle is parsed,
+    it plans directory creation and renders the structure report.
+    """
+    __slots__ = ('children', 'files', 'file_count', 'size', 'extensions')
+
+    def __init__(self):
+        self.children: Dict[str, 'PathTrie'] = {}
+        # File name -> size in bytes
+        self.files: Dict[str, int] = {}
+        # Rollups over this directory and everything below it, filled in by rollup()
+        self.file_count = 0
+        self.size = 0
+        self.extensions: Dict[str, int] = {}
+
+    def add(self, root: str, path: str, size: int):
+        """Record the file ``path`` (a ``/``-separated section path) under the output directory ``root``."""
+        node = self
+        parts = path.split('/')
+        for name in [root, *parts[:-1]] if root else parts[:-1]:
+            child = node.children.get(name)
+            if child is None:
+                child = node.children[name] = PathTrie()
+            node = child
+        node.files[parts[-1]] = size
+
+    def directories(self) -> List[str]:
+        """Every directory below the root, shallowest first and each exactly once."""
+        dirs = []
+        level = [('', self)]
+        while level:
+            next_level = []
+            for path, node in level:
+                for name in sorted(node.children):
+                    child_path = os.path.join(path, name) if path else name
+                    dirs.append(child_path)
+                    next_level.append((child_path, node.children[name]))
+            level = next_level
+        return dirs
+
+    def rollup(self):
+        """Compute file counts, sizes and extension counts for every directory, bottom up."""
+        self.file_count = len(self.files)
+        self.size = sum(self.files.values())
+        self.extensions = {}
+        for name in self.files:
+            ext = Path(name).suffix or 'no extension'
+            self.extensions[ext] = self.extensions.get(ext, 0) + 1
+        for child in self.children.values():
+            child.rollup()
+            self.file_count += child.file_count
+            self.size += child.size
+            for ext, count in child.extensions.items():
+                self.extensions[ext] = self.extensions.get(ext, 0) + count
+
+    def walk(self, path: str = '', depth: int = 0) -> Iterator[Tuple[int, str, str, Optional['PathTrie']]]:
+        """Yield ``(depth, name, path, node)`` depth first: files (node None), then subdirectories."""
+        for name in sorted(self.files):
+            yield depth, name, os.path.join(path, name), None
+        for name in sorted(self.children):
+            child = self.children[name]
+            child_path = os.path.join(path, name) if path else name
+            yield depth, name, child_path, child
+            yield from child.walk(child_path, depth + 1)
+
+
+class ContentManifest:
+    """Path -> content hash/size/mtime record of a generated output tree.
+
+    Stored next to the output directory as ``<output_dir>.manifest.json`` so
+    that a re-run only rewrites files whose content changed, leaving mtimes
+    (and the Metro/Jest/tsc caches keyed on them) alone. Watch passes append
+    the entries they change to ``<output_dir>.manifest.journal`` instead of
+    rewriting the whole record; a full save folds the journal back in.
+    """
+    VERSION = 2
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.path = self.path_for(output_dir)
+        self.journal_path = self.journal_for(output_dir)
+        self.previous: Dict[str, Dict[str, any]] = {}
+        self.current: Dict[str, Dict[str, any]] = {}
+        # Paths recorded or dropped since the last save, and journal lines on disk
+        self.changed = set()
+        self.journal_lines = 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            # Version 1 records are the same without a journal
+            if data.get('version') in (1, self.VERSION):
+                self.previous = data.get('files', {})
+                self._replay()
+        except (OSError, ValueError):
+            pass
+
+    def _replay(self):
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        rel_path, entry = json.loads(line)
+                    except ValueError:
+                        # A pass interrupted mid-append; the rest is unusable
+                        break
+                    if entry is None:
+                        self.previous.pop(rel_path, None)
+                    else:
+                        self.previous[rel_path] = entry
+                    self.journal_lines += 1
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def path_for(output_dir: str) -> str:
+        return os.path.normpath(output_dir) + '.manifest.json'
+
+    @staticmethod
+    def journal_for(output_dir: str) -> str:
+        return os.path.normpath(output_dir) + '.manifest.journal'
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def check(self, rel_path: str, data: bytes) -> bool:
+        """Record ``data`` for ``rel_path``; True if the file on disk already holds it."""
+        entry = {'sha256': self.digest(data), 'size': len(data)}
+        self.current[rel_path] = entry
+        self.changed.add(rel_path)
+        previous = self.previous.get(rel_path)
+        if previous is None or previous['sha256'] != entry['sha256'] or previous['size'] != entry['size']:
+            return False
+        # Guard against files edited or removed behind the manifest's back
+        file_path = os.path.join(self.output_dir, rel_path)
+        try:
+            stat = os.stat(file_path)
+            if stat.st_size != len(data):
+                return False
+            if (stat.st_mtime_ns, stat.st_ino) != (previous.get('mtime_ns'), previous.get('ino')):
+                # Touched or replaced since it was recorded; a same-size edit only shows in the bytes
+                with open(file_path, 'rb') as f:
+                    if f.read() != data:
+                        return False
+        except OSError:
+            return False
+        entry['mtime_ns'], entry['ino'] = stat.st_mtime_ns, stat.st_ino
+        return True
+
+    def stamp(self, rel_path: str):
+        """Record the mtime and inode of the file just written for ``rel_path``, for the next check()."""
+        entry = self.current.get(rel_path)
+        if entry is None:
+            return
+        try:
+            stat = os.stat(os.path.join(self.output_dir, rel_path))
+        except OSError:
+            return
+        entry['mtime_ns'], entry['ino'] = stat.st_mtime_ns, stat.st_ino
+
+    def keep(self, rel_path: str):
+        """Carry a file the pass did not process (filtered out) over from the previous record."""
+        if rel_path in self.previous:
+            self.current[rel_path] = self.previous[rel_path]
+
+    def carry(self):
+        """Start another pass from this one's record instead of an empty one (watch mode)."""
+        self.previous = self.current
+        self.current = dict(self.previous)
+
+    def discard(self, rel_path: str):
+        """Forget a file the bundle no longer produces, so prune() removes it."""
+        if self.current.pop(rel_path, None) is not None:
+            self.changed.add(rel_path)
+
+    def stale_paths(self) -> List[str]:
+        """Paths written by the previous run that the current run did not produce."""
+        return sorted(set(self.previous) - set(self.current))
+
+    def prune(self) -> List[str]:
+        """Delete stale files (and directories left empty) from the output tree."""
+        removed = []
+        for rel_path in self.stale_paths():
+            file_path = os.path.join(self.output_dir, rel_path)
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                continue
+            removed.append(file_path)
+            remove_empty_parents(file_path, self.output_dir)
+        return removed
+
+    def save(self, incremental: bool = False):
+        """Write the record; ``incremental`` appends only the changed entries to the journal.
+
+        Incremental saves assume the files on disk hold ``previous``; the
+        journal is folded into a full save once it outgrows a quarter of the
+        record.
+        """
+        changes = [(rel_path, self.current.get(rel_path)) for rel_path in sorted(self.changed)
+                   if self.current.get(rel_path) != self.previous.get(rel_path)]
+        self.changed = set()
+        if incremental and os.path.exists(self.path) and \
+                self.journal_lines + len(changes) <= max(1024, len(self.current) // 4):
+            if changes:
+                with open(self.journal_path, 'a', encoding='utf-8') as f:
+                    f.writelines(json.dumps(change, separators=(',', ':')) + '\n' for change in changes)
+                self.journal_lines += len(changes)
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            # Compact separators keep json on its C encoder; indent would not
+            json.dump({'version': self.VERSION, 'files': self.current}, f, separators=(',', ':'), sort_keys=True)
+        os.replace(tmp_path, self.path)
+        if self.journal_lines or os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.journal_lines = 0
+
+
+# Changes whenever the rewrite tables change, so cached rewritten content is
+# never reused under different rules. Bump PARSE_RULES_REVISION for changes to
+# parsing or validation logic that the tables do not capture.
+PARSE_RULES_REVISION = 3
+RULES_VERSION = hashlib.sha256(json.dumps(
+    [PARSE_RULES_REVISION, IMPORT_ALIASES, REQUIRE_REWRITES, sorted(LEGACY_PATHS)]
+).encode('utf-8')).hexdigest()[:16]
+
+
+class ParseCache:
+    """On-disk cache of parsed bundles: section index, validation state and rewritten files.
+
+    Entries are keyed by a hash of the bundle bytes, the route configuration
+    and RULES_VERSION. The bundle is only re-hashed when its mtime or size
+    changed since it was last seen. Entries unused for ``max_age_days`` are
+    evicted, then the least recently used ones until the cache fits in
+    ``max_bytes``.
+    """
+    STATS_FILE = 'stats.json'
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 256 * 1024 * 1024,
+                 max_age_days: float = 7):
+        self.cache_dir = cache_dir or self.default_dir()
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+
+    @staticmethod
+    def default_dir() -> str:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        return os.path.join(base, 'study-buddy')
+
+    def _read_stats(self) -> Dict[str, List]:
+        try:
+            with open(os.path.join(self.cache_dir, self.STATS_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _replace(self, name: str, data: bytes):
+        # Write beside the target and rename, so concurrent runs never read a partial file
+        path = os.path.join(self.cache_dir, name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def content_digest(self, input_file: str) -> str:
+        """Hash of the bundle bytes, reusing the last hash while mtime and size are unchanged."""
+        path = os.path.realpath(input_file)
+        stat = os.stat(path)
+        stats = self._read_stats()
+        known = stats.get(path)
+        if known and known[:2] == [stat.st_mtime_ns, stat.st_size]:
+            return known[2]
+        h = hashlib.blake2b()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+        stats[path] = [stat.st_mtime_ns, stat.st_size, digest]
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._replace(self.STATS_FILE, json.dumps(stats).encode('utf-8'))
+        except OSError:
+            pass
+        return digest
+
+    def key(self, input_file: str, routes: Iterable['Route'], path_filter: Optional['PathFilter'] = None) -> str:
+        config = [[route.header_prefix, route.output_dir, getattr(route.rewrite, '__name__', None),
+                   sorted(route.legacy_paths), list(route.import_prefixes)] for route in routes]
+        patterns = [path_filter.include, path_filter.exclude] if path_filter else None
+        h = hashlib.sha256(json.dumps([RULES_VERSION, config, patterns]).encode('utf-8'))
+        # Bundle digest first, so evict() can tell which remembered digests still have entries
+        return f"{self.content_digest(input_file)}-{h.hexdigest()[:32]}"
+
+    def load(self, key: str) -> Optional[Dict[str, any]]:
+        path = os.path.join(self.cache_dir, f"{key}.pickle")
+        try:
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+            # Refresh the entry's age for eviction
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Truncated or written by an incompatible version: treat as a miss
+            return None
+        return data
+
+    def store(self, key: str, data: Dict[str, any]):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._replace(f"{key}.pickle", pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+            self.evict()
+        except OSError:
+            # The cache is an optimisation; a read-only or full disk is not an error
+            pass
+
+    def evict(self):
+        """Drop entries older than max_age, then the least recently used beyond max_bytes.
+
+        Remembered bundle digests go with the last entry using them, or with
+        the bundle itself, so the stats file stays bounded by the cache.
+        """
+        now = time.time()
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith('.pickle'):
+                    continue
+                stat = entry.stat()
+                if now - stat.st_mtime > self.max_age:
+                    os.remove(entry.path)
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        entries.sort()
+        evicted = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            evicted += 1
+        live = {os.path.basename(path).split('-', 1)[0] for _, _, path in entries[evicted:]}
+        stats = self._read_stats()
+        kept = {path: known for path, known in stats.items() if known[2] in live and os.path.exists(path)}
+        if len(kept) != len(stats):
+            self._replace(self.STATS_FILE, json.dumps(kept).encode('utf-8'))
+
+
+# Quoted module specifiers of import/export/require/import() statements
+_SPECIFIER_RE = re.compile(rb"""\b(?:from|import|require)\s*\(?\s*(['"])([^'"\n]+)\1""")
+_MODULE_EXTENSIONS = ('.ts', '.tsx', '.js', '.jsx', '.mjs', '.cjs', '.json')
+
+
+class ExtractionValidator:
+    """Validation checks fed one section at a time while the bundle is indexed.
+
+    Duplicates and import targets are resolved through hash indexes, so the
+    whole check is linear in the number of sections and imports. Findings
+    refer to their sections and are reported in bundle order, so a section
+    can be taken back out with remove() and re-added after an edit (--watch).
+    """
+    LARGE_FILE_BYTES = 50000
+
+    def __init__(self, output_dir: str, import_prefixes: Tuple[str, ...] = ()):
+        self.output_dir = output_dir
+        self.import_prefixes = import_prefixes
+        # Path -> every section with that path; more than one is a duplicate
+        self.paths: Dict[str, List[Section]] = {}
+        self.duplicates = set()
+        # Module key -> number of paths providing it
+        self.modules: Dict[str, int] = {}
+        self.empty: List[Section] = []
+        self.large: List[Section] = []
+        self.unclosed: List[Section] = []
+        self.no_content: List[Section] = []
+        # Import specifier -> sections importing it, and each section's specifiers in source order
+        self.imports: Dict[str, List[Section]] = {}
+        self.specs: Dict[Section, Tuple[str, ...]] = {}
+
+    def add(self, index: SectionIndex, section: Section):
+        """Check one section and index its path and the imports it makes."""
+        path = section.path
+        if section.content_start is None or not section.has_content:
+            self.no_content.append(section)
+            return
+        if section.close_fence is None:
+            self.unclosed.append(section)
+
+        same_path = self.paths.setdefault(path, [])
+        same_path.append(section)
+        if len(same_path) == 1:
+            self._count_modules(path, 1)
+        else:
+            self.duplicates.add(path)
+
+        if index.is_blank(section):
+            self.empty.append(section)
+        if section.size > self.LARGE_FILE_BYTES:
+            self.large.append(section)
+
+        if self.import_prefixes:
+            specs = {}
+            for m in index.finditer(_SPECIFIER_RE, section):
+                spec = rewrite_specifier(m.group(2).decode('utf-8', errors='replace'))
+                if spec.startswith(self.import_prefixes) and spec not in specs:
+                    specs[spec] = None
+                    self.imports.setdefault(spec, []).append(section)
+            if specs:
+                self.specs[section] = tuple(specs)
+
+    def remove(self, section: Section):
+        """Undo add() for a section, e.g. one replaced by an edit."""
+        path = section.path
+        if section.content_start is None or not section.has_content:
+            self.no_content.remove(section)
+            return
+        if section.close_fence is None:
+            self.unclosed.remove(section)
+
+        same_path = self.paths[path]
+        same_path.remove(section)
+        if not same_path:
+            del self.paths[path]
+            self._count_modules(path, -1)
+        elif len(same_path) == 1:
+            self.duplicates.discard(path)
+
+        for findings in (self.empty, self.large):
+            if section in findings:
+                findings.remove(section)
+
+        for spec in self.specs.pop(section, ()):
+            importers = self.imports[spec]
+            importers.remove(section)
+            if not importers:
+                del self.imports[spec]
+
+    def add_module(self, path: str):
+        """Index a path that is in the bundle but was filtered out, so imports of it still resolve."""
+        self._count_modules(path, 1)
+
+    def remove_module(self, path: str):
+        self._count_modules(path, -1)
+
+    def _count_modules(self, path: str, delta: int):
+        modules = self.modules
+        for key in self._module_keys(path):
+            count = modules.get(key, 0) + delta
+            if count:
+                modules[key] = count
+            else:
+                del modules[key]
+
+    @staticmethod
+    def _module_keys(path: str) -> List[str]:
+        """Names an import may use for ``path``: with or without extension, or its directory for index files."""
+        keys = [path]
+        stem, ext = os.path.splitext(path)
+        if ext in _MODULE_EXTENSIONS:
+            keys.append(stem)
+            if os.path.basename(stem) == 'index':
+                keys.append(os.path.dirname(stem))
+        return keys
+
+    def _out(self, path: str) -> str:
+        return os.path.join(self.output_dir, path)
+
+    @staticmethod
+    def _in_order(sections: Iterable[Section]) -> List[Section]:
+        return sorted(sections, key=lambda section: section.header_offset)
+
+    def issues(self) -> List[str]:
+        issues = []
+        if self.empty:
+            issues.append(f"Empty files detected: {', '.join(self._out(s.path) for s in self._in_order(self.empty))}")
+        if self.duplicates:
+            # In the order the second copy of each path appears
+            duplicates = sorted(self.duplicates, key=lambda p: self._in_order(self.paths[p])[1].header_offset)
+            issues.append(f"Duplicate file paths: {', '.join(self._out(p) for p in duplicates)}")
+        for section in self._in_order(self.large):
+            issues.append(f"Large file detected: {self._out(section.path)} ({section.size} bytes)")
+        for section in self._in_order(self.unclosed):
+            issues.append(f"Unclosed code block: {section.path} (header at line {section.line_start})")
+        for section in self._in_order(self.no_content):
+            issues.append(f"Header without content block: {section.path} (line {section.line_start})")
+        unresolved = []
+        for spec, sections in self.imports.items():
+            # '@/' is the project root, i.e. the output directory
+            if spec[2:] not in self.modules:
+                sections = self._in_order(sections)
+                # Ordered by first import; consecutive sections with the same path count once
+                importers = [s.path for i, s in enumerate(sections) if not i or sections[i - 1].path != s.path]
+                first = sections[0]
+                unresolved.append(((first.header_offset, self.specs[first].index(spec)), spec, importers))
+        for _, spec, importers in sorted(unresolved, key=lambda item: item[0]):
+            shown = ', '.join(importers[:3]) + (f" (+{len(importers) - 3} more)" if len(importers) > 3 else '')
+            issues.append(f"Unresolved import '{spec}' in {shown}")
+        return issues
+
+
+class PathFilter:
+    """Include/exclude globs over section paths, compiled into one regex each.
+
+    ``*`` matches within a path segment, ``**`` across any number of segments
+    and ``?`` a single character. A pattern without a ``/`` matches the file
+    name at any depth. A path is kept if it matches an include (or none are
+    given) and no exclude.
+    """
+
+    def __init__(self, include: Iterable[str] = (), exclude: Iterable[str] = ()):
+        self.include = list(include)
+        self.exclude = list(exclude)
+        self._include = self._compile(self.include)
+        self._exclude = self._compile(self.exclude)
+
+    @staticmethod
+    def _translate(pattern: str) -> str:
+        pattern = pattern.strip('/')
+        if '/' not in pattern:
+            pattern = '**/' + pattern
+        out = []
+        i = 0
+        while i < len(pattern):
+            if pattern.startswith('**/', i):
+                out.append('(?:.*/)?')
+                i += 3
+            elif pattern.startswith('/**', i) and i + 3 == len(pattern):
+                out.append('(?:/.*)?')
+                i += 3
+            elif pattern.startswith('**', i):
+                out.append('.*')
+                i += 2
+            elif pattern[i] == '*':
+                out.append('[^/]*')
+                i += 1
+            elif pattern[i] == '?':
+                out.append('[^/]')
+                i += 1
+            else:
+                out.append(re.escape(pattern[i]))
+                i += 1
+        return ''.join(out)
+
+    @classmethod
+    def _compile(cls, patterns: List[str]) -> Optional[re.Pattern]:
+        if not patterns:
+            return None
+        return re.compile('|'.join(f"(?:{cls._translate(p)})" for p in patterns))
+
+    def __call__(self, path: str) -> bool:
+        if self._include is not None and not self._include.fullmatch(path):
+            return False
+        return self._exclude is None or not self._exclude.fullmatch(path)
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> Optional['PathFilter']:
+        """Build the filter for --include/--exclude/--filter-file, or None if no patterns were given."""
+        include, exclude = list(args.include), list(args.exclude)
+        if args.filter_file:
+            with open(args.filter_file, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            include += config.get('include', [])
+            exclude += config.get('exclude', [])
+        if not include and not exclude:
+            return None
+        return cls(include, exclude)
+
+
+class Metrics:
+    """Per-phase wall/CPU timings and throughput counters for one split.
+
+    Phases may run on several threads at once (see pipeline_files); CPU time
+    is measured per thread, so it sums the work done across the pool.
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.rewrites: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    @contextmanager
+    def phase(self, name: str):
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.thread_time() - cpu
+            with self._lock:
+                entry = self.phases.setdefault(name, {'wall_s': 0.0, 'cpu_s': 0.0, 'calls': 0})
+                entry['wall_s'] += wall
+                entry['cpu_s'] += cpu
+                entry['calls'] += 1
+
+    def add(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @staticmethod
+    def peak_rss_kb() -> Optional[int]:
+        try:
+            import resource
+        except ImportError:
+            # Not available on Windows
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Reported in bytes on macOS, kilobytes elsewhere
+        return peak // 1024 if sys.platform == 'darwin' else peak
+
+    def to_dict(self) -> Dict[str, any]:
+        return {
+            'total_wall_s': time.perf_counter() - self._start,
+            'total_cpu_s': time.process_time() - self._cpu_start,
+            'peak_rss_kb': self.peak_rss_kb(),
+            'phases': self.phases,
+            'counters': self.counters,
+            'rewrites': self.rewrites,
+        }
+
+    def write_json(self, path: str, **extra):
+        data = dict(extra)
+        data.update(self.to_dict())
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+
+
+class Reporter:
+    """Buffered console output for the splitters.
+
+    Every message carries a level: DETAIL (per-file progress and the structure
+    tree), SUMMARY (totals, validation verdict, completion) or WARN (issues and
+    errors). ``verbose`` prints everything, ``summary`` drops DETAIL, ``quiet``
+    keeps only WARN, and ``json-lines`` prints one JSON object per event
+    instead of text. Output is flushed in blocks rather than line by line.
+    """
+    DETAIL, SUMMARY, WARN = range(3)
+    MODES = ('verbose', 'summary', 'quiet', 'json-lines')
+    _THRESHOLDS = {'verbose': DETAIL, 'summary': SUMMARY, 'quiet': WARN, 'json-lines': DETAIL}
+
+    def __init__(self, mode: str = 'verbose', stream=None, buffer_size: int = 1 << 16):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown report mode '{mode}'")
+        self.mode = mode
+        self.json_lines = mode == 'json-lines'
+        self.threshold = self._THRESHOLDS[mode]
+        # None resolves to sys.stdout at flush time, so redirections are honoured
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self._buffer: List[str] = []
+        self._buffered = 0
+        self._lock = threading.Lock()
+
+    @property
+    def verbose(self) -> bool:
+        """True when per-file text is printed, i.e. worth building previews for."""
+        return self.mode == 'verbose'
+
+    def wants(self, level: int) -> bool:
+        return level >= self.threshold
+
+    def emit(self, level: int, text: Optional[str] = None, event: Optional[str] = None, **fields):
+        """Queue ``text`` (text modes) or the ``event`` record (json-lines) if ``level`` is shown."""
+        if level < self.threshold:
+            return
+        if self.json_lines:
+            if event is None:
+                return
+            record = {'event': event}
+            record.update(fields)
+            line = json.dumps(record) + '\n'
+        elif text is None:
+            return
+        else:
+            line = text + '\n'
+        with self._lock:
+            self._buffer.append(line)
+            self._buffered += len(line)
+            if self._buffered >= self.buffer_size:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._buffer:
+            stream = self.stream or sys.stdout
+            stream.write(''.join(self._buffer))
+            stream.flush()
+            self._buffer.clear()
+            self._buffered = 0
+
+
+class BlobStore:
+    """Content-addressed store of output files, shared by any number of output trees.
+
+    Each distinct content is written once, as a read-only file named by its
+    SHA-256, and materialised into trees as a hard link; where linking is not
+    possible (another filesystem) a reflink clone is tried, then a plain copy.
+    Blobs are read-only so an in-place edit cannot leak into other trees;
+    editors that save by rename simply replace the link.
+    """
+    # Linux FICLONE ioctl: share extents on btrfs/XFS instead of copying
+    _FICLONE = 0x40049409
+
+    def __init__(self, root: str):
+        self.root = root
+        self.stats = {'blobs': 0, 'blob_bytes': 0, 'hardlinks': 0, 'reflinks': 0, 'copies': 0}
+        self._lock = threading.Lock()
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:])
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def put(self, data: bytes) -> str:
+        """Store ``data`` unless an identical blob exists; returns the blob path."""
+        blob = self.path(hashlib.sha256(data).hexdigest())
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            # Unique temp name: several threads or processes may store the same blob
+            tmp_path = f"{blob}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, blob)
+            self._count('blobs')
+            self._count('blob_bytes', len(data))
+        return blob
+
+    def materialize(self, data: bytes, file_path: str):
+        """Make ``file_path`` hold ``data``, sharing storage with the blob where possible."""
+        blob = self.put(data)
+        if os.path.lexists(file_path):
+            os.unlink(file_path)
+        try:
+            os.link(blob, file_path)
+            self._count('hardlinks')
+            return
+        except FileNotFoundError:
+            if os.path.exists(blob):
+                raise
+            # Collected by gc() between put() and link(): store it again
+            os.link(self.put(data), file_path)
+            self._count('hardlinks')
+            return
+        except OSError:
+            # Cross-device, or a filesystem without hard links
+            pass
+        if self._reflink(blob, file_path):
+            self._count('reflinks')
+        else:
+            shutil.copyfile(blob, file_path)
+            self._count('copies')
+
+    @classmethod
+    def _reflink(cls, source: str, file_path: str) -> bool:
+        try:
+            import fcntl
+        except ImportError:
+            # Not available on Windows
+            return False
+        with open(source, 'rb') as src, open(file_path, 'wb') as dst:
+            try:
+                fcntl.ioctl(dst.fileno(), cls._FICLONE, src.fileno())
+                return True
+            except OSError:
+                return False
+
+    def gc(self) -> int:
+        """Delete blobs no output tree links to any more; returns how many were removed.
+
+        Trees materialised by reflink or copy do not hold links, so their blobs
+        are collected too and simply stored again when next needed.
+        """
+        removed = 0
+        if not os.path.isdir(self.root):
+            return removed
+        with os.scandir(self.root) as shards:
+            for shard in shards:
+                if not shard.is_dir():
+                    continue
+                with os.scandir(shard.path) as blobs:
+                    for blob in blobs:
+                        if blob.stat().st_nlink == 1:
+                            os.remove(blob.path)
+                            removed += 1
+        return removed
+
+    def summary(self) -> str:
+        stats = self.stats
+        return (f"Blob store {self.root}: {stats['blobs']} new blobs ({stats['blob_bytes']:,} bytes), "
+                f"{stats['hardlinks']} hard links, {stats['reflinks']} reflinks, {stats['copies']} copies")
+
+
+class DirectorySink:
+    """Output backend that writes every file into the filesystem (the default).
+
+    With a BlobStore, files are materialised from the store instead of written.
+    """
+    label = 'Created'
+    # Content manifests and pruning only make sense for a persistent tree
+    incremental = True
+
+    def __init__(self, store: Optional[BlobStore] = None):
+        self.store = store
+
+    def begin(self, output_dirs: Iterable[str]):
+        pass
+
+    def working_dir(self, output_dir: str) -> str:
+        """Where ``output_dir``'s files physically live while a pass is being written."""
+        return output_dir
+
+    def make_dir(self, dir_path: str) -> bool:
+        """Create ``dir_path``; returns False if it already existed."""
+        if os.path.isdir(dir_path):
+            return False
+        os.makedirs(dir_path, exist_ok=True)
+        return True
+
+    def track(self, output_dir: str, rel_paths: Iterable[str], pruned: bool = False):
+        """Called before close() with the generated files of ``output_dir`` (its manifest) and whether any were pruned."""
+        pass
+
+    def write(self, file_path: str, data: bytes):
+        if self.store:
+            self.store.materialize(data, file_path)
+            return
+        try:
+            # Never write through a link shared with the blob store or a staged tree
+            if os.stat(file_path).st_nlink > 1:
+                os.unlink(file_path)
+        except FileNotFoundError:
+            pass
+        with open(file_path, 'wb') as f:
+            f.write(data)
+
+    def close(self):
+        pass
+
+    def abort(self):
+        """Called instead of close() when a pass fails; files already written stay."""
+        pass
+
+
+class ArchiveSink:
+    """Output backend that streams every file into one tar, tar.gz or zip archive.
+
+    ``target`` picks the format from its extension (``.tar``, ``.tar.gz``,
+    ``.tgz`` or ``.zip``); ``-`` writes an uncompressed tar stream to stdout.
+    Members keep their output paths and get the mode the directory backend
+    would create them with. The archive is built as ``<target>.tmp`` and
+    only replaces ``target`` once complete, so a failed pass leaves any
+    existing archive untouched.
+    """
+    label = 'Archived'
+    incremental = False
+
+    def __init__(self, target: str):
+        self.target = target
+        self._lock = threading.Lock()
+        self._tar = None
+        self._zip = None
+        self.mtime = int(os.environ.get('SOURCE_DATE_EPOCH', time.time()))
+        umask = os.umask(0)
+        os.umask(umask)
+        self.file_mode = 0o666 & ~umask
+        self.dir_mode = 0o777 & ~umask
+        if target != '-' and not target.endswith(('.tar.gz', '.tgz', '.tar', '.zip')):
+            raise ValueError(f"Unsupported archive type: {target} (use .tar, .tar.gz, .tgz, .zip or -)")
+        self._tmp_path = None if target == '-' else f"{target}.tmp"
+
+    def begin(self, output_dirs: Iterable[str]):
+        target = self.target
+        if target == '-':
+            self._tar = tarfile.open(fileobj=sys.stdout.buffer, mode='w|')
+        elif target.endswith(('.tar.gz', '.tgz')):
+            self._tar = tarfile.open(self._tmp_path, 'w:gz')
+        elif target.endswith('.tar'):
+            self._tar = tarfile.open(self._tmp_path, 'w')
+        else:
+            self._zip = zipfile.ZipFile(self._tmp_path, 'w', compression=zipfile.ZIP_DEFLATED)
+
+    def make_dir(self, dir_path: str) -> bool:
+        name = Path(dir_path).as_posix()
+        with self._lock:
+            if self._tar:
+                info = tarfile.TarInfo(name)
+                info.type = tarfile.DIRTYPE
+                info.mode = self.dir_mode
+                info.mtime = self.mtime
+                self._tar.addfile(info)
+            else:
+                info = zipfile.ZipInfo(name + '/', time.localtime(self.mtime)[:6])
+                info.external_attr = (0o40000 | self.dir_mode) << 16
+                self._zip.writestr(info, b'')
+        return True
+
+    def write(self, file_path: str, data: bytes):
+        name = Path(file_path).as_posix()
+        with self._lock:
+            if self._tar:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mode = self.file_mode
+                info.mtime = self.mtime
+                self._tar.addfile(info, io.BytesIO(data))
+            else:
+                info = zipfile.ZipInfo(name, time.localtime(self.mtime)[:6])
+                info.external_attr = (0o100000 | self.file_mode) << 16
+                info.compress_type = zipfile.ZIP_DEFLATED
+                self._zip.writestr(info, data)
+
+    def close(self):
+        if self._tar:
+            self._tar.close()
+        if self._zip:
+            self._zip.close()
+        if (self._tar or self._zip) and self._tmp_path:
+            os.replace(self._tmp_path, self.target)
+        self._tar = self._zip = None
+
+    def abort(self):
+        try:
+            if self._tar:
+                self._tar.close()
+            if self._zip:
+                self._zip.close()
+        finally:
+            self._tar = self._zip = None
+            if self._tmp_path and os.path.exists(self._tmp_path):
+                os.remove(self._tmp_path)
+
+
+def _rename_exchange(a: str, b: str) -> bool:
+    """Atomically swap two paths with renameat2(RENAME_EXCHANGE); False where unsupported."""
+    try:
+        import ctypes
+        renameat2 = ctypes.CDLL(None, use_errno=True).renameat2
+    except (ImportError, OSError, AttributeError):
+        # Not Linux/glibc
+        return False
+    AT_FDCWD, RENAME_EXCHANGE = -100, 2
+    return renameat2(AT_FDCWD, os.fsencode(a), AT_FDCWD, os.fsencode(b), RENAME_EXCHANGE) == 0
+
+
+def _swap_manifests(a: str, b: str):
+    """Swap the content manifests (and their journals) kept next to output trees ``a`` and ``b``."""
+    for path_a, path_b in ((ContentManifest.path_for(a), ContentManifest.path_for(b)),
+                           (ContentManifest.journal_for(a), ContentManifest.journal_for(b))):
+        tmp_path = path_a + '.swap'
+        if os.path.exists(path_a):
+            os.replace(path_a, tmp_path)
+        if os.path.exists(path_b):
+            os.replace(path_b, path_a)
+        if os.path.exists(tmp_path):
+            os.replace(tmp_path, path_b)
+
+
+def _detach_tree(tree_dir: str, live_dir: str, rel_paths: Iterable[str]):
+    """Copy each of ``rel_paths`` in ``tree_dir`` that shares its inode with the same path in ``live_dir``.
+
+    Staging mirrors unchanged files as hard links, so without this an in-place
+    edit of a generated file in the live tree (an editor, ``prettier --write``)
+    would also change the tree kept for rollback. Untracked files such as
+    ``node_modules`` stay linked.
+    """
+    for rel_path in rel_paths:
+        file_path = os.path.join(tree_dir, rel_path)
+        try:
+            kept = os.lstat(file_path)
+            live = os.lstat(os.path.join(live_dir, rel_path))
+        except FileNotFoundError:
+            continue
+        if not os.path.samestat(kept, live):
+            continue
+        tmp_path = file_path + '.detach'
+        shutil.copy2(file_path, tmp_path)
+        os.replace(tmp_path, file_path)
+
+
+def publish_tree(staging_dir: str, output_dir: str, previous_dir: str, generated: Iterable[str] = ()):
+    """Make ``staging_dir`` the live ``output_dir``, keeping the old tree as ``previous_dir``.
+
+    Where the kernel supports it the two trees are exchanged in one rename, so
+    readers see either the old tree or the new one; otherwise the live tree is
+    missing for the instant between two renames, but is never partial. Once
+    published, the previous tree gets its own copies of the ``generated``
+    files (relative paths) it shares with the live one, so they stay an
+    independent snapshot.
+    """
+    if os.path.exists(previous_dir):
+        shutil.rmtree(previous_dir)
+    if not os.path.exists(output_dir):
+        os.rename(staging_dir, output_dir)
+        return
+    if _rename_exchange(staging_dir, output_dir):
+        os.rename(staging_dir, previous_dir)
+    else:
+        os.rename(output_dir, previous_dir)
+        os.rename(staging_dir, output_dir)
+    # The live manifest now describes the previous tree
+    _swap_manifests(output_dir, previous_dir)
+    _detach_tree(previous_dir, output_dir, generated)
+
+
+def rollback_tree(output_dir: str) -> bool:
+    """Swap ``output_dir`` with the tree kept by the last staged publish.
+
+    Rolling back twice rolls forward again. Returns False if there is no previous tree.
+    """
+    previous_dir = StagedSink.sibling(output_dir, 'previous')
+    if not os.path.isdir(previous_dir):
+        return False
+    if not _rename_exchange(previous_dir, output_dir):
+        tmp_dir = StagedSink.sibling(output_dir, 'rollback')
+        os.rename(output_dir, tmp_dir)
+        os.rename(previous_dir, output_dir)
+        os.rename(tmp_dir, previous_dir)
+    _swap_manifests(output_dir, previous_dir)
+    return True
+
+
+class StagedSink(DirectorySink):
+    """Directory backend that publishes each pass all at once (``--staged``).
+
+    Every output directory is mirrored into a sibling ``<dir>.staging`` with
+    hard links, the pass writes there (replacing, never modifying, linked
+    files), and close() swaps the staging tree in with a rename. The replaced
+    tree is kept as ``<dir>.previous`` for rollback_tree(), with copies of
+    the generated files rather than links so edits to the live tree do not
+    reach them. File watchers see one change per pass, none for a pass that
+    wrote and pruned nothing, and readers never see a half-written tree.
+    """
+    label = 'Created'
+    incremental = True
+
+    def __init__(self, store: Optional[BlobStore] = None):
+        super().__init__(store)
+        self.staging: Dict[str, str] = {}
+        self.published: List[str] = []
+        # Output directories the pass wrote to or pruned, and their generated files (see track())
+        self.changed = set()
+        self.generated: Dict[str, Iterable[str]] = {}
+
+    @staticmethod
+    def sibling(output_dir: str, suffix: str) -> str:
+        return f"{os.path.abspath(output_dir)}.{suffix}"
+
+    def begin(self, output_dirs: Iterable[str]):
+        self.staging = {}
+        self.published = []
+        self.changed = set()
+        self.generated = {}
+        for output_dir in output_dirs:
+            staging_dir = self.sibling(output_dir, 'staging')
+            # Left behind by a pass that failed before publishing
+            if os.path.exists(staging_dir):
+                shutil.rmtree(staging_dir)
+            if os.path.isdir(output_dir):
+                self._mirror(output_dir, staging_dir)
+            else:
+                os.makedirs(staging_dir)
+            self.staging[output_dir] = staging_dir
+
+    @staticmethod
+    def _mirror(src: str, dst: str):
+        """Recreate ``src`` under ``dst`` with hard links instead of copies where possible."""
+        for dir_path, dir_names, file_names in os.walk(src):
+            target = os.path.join(dst, os.path.relpath(dir_path, src))
+            os.makedirs(target, exist_ok=True)
+            for name in list(dir_names):
+                if os.path.islink(os.path.join(dir_path, name)):
+                    # Recreate symlinked directories as links, without descending
+                    dir_names.remove(name)
+                    file_names.append(name)
+            for name in file_names:
+                source = os.path.join(dir_path, name)
+                if os.path.islink(source):
+                    os.symlink(os.readlink(source), os.path.join(target, name))
+                    continue
+                try:
+                    os.link(source, os.path.join(target, name))
+                except OSError:
+                    # Cross-device or no hard link support
+                    shutil.copy2(source, os.path.join(target, name))
+
+    def working_dir(self, output_dir: str) -> str:
+        return self.staging.get(output_dir, output_dir)
+
+    def _owner(self, path: str) -> str:
+        """The staged output directory ``path`` lies in."""
+        for output_dir in self.staging:
+            if path == output_dir or path.startswith(output_dir.rstrip(os.sep) + os.sep):
+                return output_dir
+        raise ValueError(f"Path outside every staged output directory: {path}")
+
+    def _staged(self, path: str) -> str:
+        output_dir = self._owner(path)
+        return self.staging[output_dir] + path[len(output_dir.rstrip(os.sep)):]
+
+    def make_dir(self, dir_path: str) -> bool:
+        created = super().make_dir(self._staged(dir_path))
+        if created:
+            self.changed.add(self._owner(dir_path))
+        return created
+
+    def write(self, file_path: str, data: bytes):
+        # Mirrored files share their inode with the live tree; the base class replaces them
+        super().write(self._staged(file_path), data)
+        self.changed.add(self._owner(file_path))
+
+    def track(self, output_dir: str, rel_paths: Iterable[str], pruned: bool = False):
+        self.generated[output_dir] = rel_paths
+        if pruned:
+            self.changed.add(output_dir)
+
+    def close(self):
+        for output_dir, staging_dir in self.staging.items():
+            if output_dir not in self.changed and os.path.isdir(output_dir):
+                # The staging copy is identical: leave the live tree (and its watchers) alone
+                shutil.rmtree(staging_dir)
+                continue
+            publish_tree(staging_dir, output_dir, self.sibling(output_dir, 'previous'),
+                         self.generated.get(output_dir, ()))
+            self.published.append(output_dir)
+        self.staging = {}
+
+    def abort(self):
+        # The live trees were never touched; drop the half-written staging copies
+        for staging_dir in self.staging.values():
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        self.staging = {}
+
+
+def open_sink(archive: Optional[str]):
+    """Return the output backend for ``--archive`` (a directory sink when unset)."""
+    if not archive:
+        return DirectorySink()
+    return ArchiveSink(archive)
+
+
+class Route:
+    """Where the sections under one header prefix go and how they are processed."""
+
+    def __init__(self, header_prefix: str, output_dir: str,
+                 rewrite: Optional[Callable[[str, Optional[Dict[str, int]]], str]] = None,
+                 legacy_paths: Iterable[str] = (),
+                 import_prefixes: Tuple[str, ...] = ()):
+        self.header_prefix = header_prefix
+        self.output_dir = output_dir
+        self.rewrite = rewrite
+        self.legacy_paths = frozenset(legacy_paths)
+        self.import_prefixes = import_prefixes
+        self.validator = ExtractionValidator(output_dir, import_prefixes)
+        self.manifest: Optional[ContentManifest] = None
+
+    def reset(self):
+        """Start validation afresh, e.g. before re-scanning a changed bundle."""
+        self.validator = ExtractionValidator(self.output_dir, self.import_prefixes)
+
+
+def default_route(header_prefix: str, output_dir: str) -> Route:
+    """Build a route with the standard rules for ``header_prefix``.
+
+    App sections get import rewriting, legacy filtering and import
+    resolution checks; any other prefix is copied verbatim.
+    """
+    if header_prefix == APP_HEADER_PREFIX:
+        return Route(header_prefix, output_dir, rewrite=rewrite_imports,
+                     legacy_paths=LEGACY_PATHS, import_prefixes=APP_IMPORT_PREFIXES)
+    return Route(header_prefix, output_dir)
+
+
+class BundleSplitter:
+    """Split one bundle into the output directories of its routes."""
+
+    def __init__(self, input_file: str, routes: Iterable[Route], dry_run: bool = True, stream: bool = False,
+                 use_manifest: bool = True, prune: bool = False, workers: int = 0, sink=None,
+                 reporter: Optional[Reporter] = None, cache: Optional[ParseCache] = None,
+                 path_filter: Optional[PathFilter] = None):
+        self.input_file = input_file
+        # --include/--exclude globs; rejected sections are skipped at their header
+        self.path_filter = path_filter
+        # All console output goes through the reporter (see --quiet/--summary/--json-lines)
+        self.report = reporter or Reporter()
+        # Where written files go: a DirectorySink, or an ArchiveSink for --archive
+        self.sink = sink or DirectorySink()
+        self.routes: Dict[str, Route] = {}
+        for route in routes:
+            if route.header_prefix in self.routes:
+                raise ValueError(f"Duplicate route for header prefix '{route.header_prefix}'")
+            self.routes[route.header_prefix] = route
+        self.dry_run = dry_run
+        self.stream = stream
+        self.use_manifest = use_manifest
+        self.prune = prune
+        # Writer threads for the pipelined mode; 0 runs the phases sequentially
+        self.workers = workers
+        self.unchanged_count = 0
+        self._lock = threading.Lock()
+        self.files_to_create: List[Dict[str, any]] = []
+        # Directory tree of every parsed file, for directory planning and the structure report
+        self.tree = PathTrie()
+        self.index: Optional[SectionIndex] = None
+        self.line_number = 0
+        # (prefix, path) of the sections the path filter rejected; their outputs are kept, not pruned
+        self.filtered: List[Tuple[str, str]] = []
+        # Set to a Metrics instance to record per-phase timings and counters
+        self.metrics: Optional[Metrics] = None
+        # Parsed sections, validation state and rewritten files of unchanged bundles (parse_file only)
+        self.cache = cache
+        # Whether the current pass continues the previous pass's manifests
+        self._carried_manifests = False
+        self._reset_watch()
+
+    def _reset_watch(self):
+        """Forget the watch state, so the next watch pass rescans the whole bundle."""
+        # The last snapshot indexed, its sections and the headers filtered out of it
+        self._watch_data: Optional[bytes] = None
+        self._watch_sections: List[Section] = []
+        self._watch_skipped: List[Tuple[str, str, int]] = []
+        # Output path -> raw content digest, and how many sections produce that path
+        self._watch_digests: Dict[str, str] = {}
+        self._watch_paths: Dict[str, int] = {}
+        # Validation issues last reported, so passes only repeat them when they change
+        self._watch_issues: List[str] = []
+
+    def _phase(self, name: str):
+        return self.metrics.phase(name) if self.metrics else nullcontext()
+
+    def _open_index(self, data: Optional[bytes] = None) -> SectionIndex:
+        return SectionIndex(self.input_file, tuple(self.routes), self.path_filter, data)
+
+    def _sections(self, index: SectionIndex, start: int = 0, stop: Optional[int] = None,
+                  line_number: int = 0, filtered: int = 0) -> Iterator[Section]:
+        """Yield the indexed sections that should be extracted, skipping legacy ones.
+
+        ``start``, ``stop`` and ``line_number`` rescan part of the bundle (see
+        SectionIndex.scan); ``filtered`` counts the sections filtered out of
+        the rest of it, for the report.
+        """
+        sections = index.scan(start, stop, line_number)
+        while True:
+            with self._phase('parse'):
+                section = next(sections, None)
+            if section is None:
+                break
+            self.line_number = index.line_number
+            if self.metrics:
+                self.metrics.add('sections')
+                self.metrics.add('section_bytes', section.size)
+            route = self.routes[section.prefix]
+            # Skip legacy paths entirely
+            if section.path in route.legacy_paths:
+                if self.dry_run:
+                    self.report.emit(Reporter.DETAIL, f"[DRY RUN] Skipping legacy section: {section.path}",
+                                     'skip', path=section.path, reason='legacy')
+                continue
+            with self._phase('validate'):
+                route.validator.add(index, section)
+            if section.has_content:
+                yield section
+        for prefix, path, _ in index.skipped:
+            self.routes[prefix].validator.add_module(path)
+        self.filtered = [(prefix, path) for prefix, path, _ in index.skipped]
+        if index.skipped or filtered:
+            self._report_filtered(len(index.skipped) + filtered)
+
+    def _report_filtered(self, count: int):
+        self.report.emit(Reporter.SUMMARY, f"Filtered out {count} sections (--include/--exclude)",
+                         'filtered', sections=count)
+        if self.metrics:
+            self.metrics.add('sections_filtered', count)
+
+    def iter_files(self) -> Iterator[Dict[str, any]]:
+        """Stream the consolidated file, yielding each file as its closing fence is seen.
+
+        The input is memory-mapped and each section is decoded only once it is
+        complete, so peak memory is bounded by the largest single section
+        rather than the whole bundle.
+        """
+        with self._open_index() as index:
+            for section in self._sections(index):
+                file_info = self._file_info(section)
+                file_info['content'] = self._render(index, section)
+                yield file_info
+
+    def parse_file(self):
+        """Index the consolidated file; contents are decoded lazily when written."""
+        self.report.emit(Reporter.DETAIL, f"{'[DRY RUN] ' if self.dry_run else ''}Parsing {self.input_file}...")
+        self.index = self._open_index()
+        key = None
+        if self.cache:
+            with self._phase('cache'):
+                key = self.cache.key(self.input_file, self.routes.values(), self.path_filter)
+                cached = self.cache.load(key)
+            if cached:
+                self._restore(cached)
+                return
+        for section in self._sections(self.index):
+            self.files_to_create.append(self._file_info(section))
+        if key:
+            with self._phase('cache'):
+                self.cache.store(key, self._snapshot())
+
+    def _snapshot(self) -> Dict[str, any]:
+        """Everything parse_file() produced, with contents rendered, for the parse cache."""
+        for file_info in self.files_to_create:
+            file_info['content'] = self.content(file_info)
+        return {
+            'files': [(f['section'], f['content']) for f in self.files_to_create],
+            'validators': {prefix: route.validator for prefix, route in self.routes.items()},
+            'legacy': [s.path for s in self.index.sections
+                       if s.path in self.routes[s.prefix].legacy_paths],
+            'filtered': self.filtered,
+            'line_number': self.line_number,
+        }
+
+    def _restore(self, cached: Dict[str, any]):
+        """Replay a parse_file() result loaded from the parse cache."""
+        # Cached offsets match this file (same content hash), so previews can still map it
+        self.index.open()
+        if self.dry_run:
+            for path in cached['legacy']:
+                self.report.emit(Reporter.DETAIL, f"[DRY RUN] Skipping legacy section: {path}",
+                                 'skip', path=path, reason='legacy')
+        for prefix, validator in cached['validators'].items():
+            self.routes[prefix].validator = validator
+        for section, content in cached['files']:
+            file_info = self._file_info(section)
+            file_info['content'] = content
+            self.files_to_create.append(file_info)
+        self.filtered = cached['filtered']
+        if self.filtered:
+            self._report_filtered(len(self.filtered))
+        self.line_number = cached['line_number']
+        if self.metrics:
+            self.metrics.add('cache_hits')
+
+    def _file_info(self, section: Section) -> Dict[str, any]:
+        route = self.routes[section.prefix]
+        self.tree.add(route.output_dir, section.path, section.size)
+        # Destination-agnostic: use the exact path from the section header
+        return {
+            'path': os.path.join(route.output_dir, section.path),
+            'route': route,
+            'section': section,
+            'size': section.size,
+            'line_start': section.line_start,
+        }
+
+    def _render(self, index: SectionIndex, section: Section) -> str:
+        with self._phase('rewrite'):
+            content = index.text(section)
+            rewrite = self.routes[section.prefix].rewrite
+            if rewrite:
+                content = rewrite(content, self.metrics.rewrites if self.metrics else None)
+            return content.rstrip() + '\n'
+
+    def content(self, file_info: Dict[str, any]) -> str:
+        """Return a file's final content, slicing it out of the index on first use."""
+        if 'content' not in file_info:
+            return self._render(self.index, file_info['section'])
+        return file_info['content']
+
+    def digests(self) -> Dict[str, Tuple[str, Dict[str, any]]]:
+        """Hash every parsed file's final (rewritten) content, keyed by output path.
+
+        Later sections win over earlier ones with the same path, as they would
+        when writing. Call after parse_file().
+        """
+        digests = {}
+        for file_info in self.files_to_create:
+            data = self.content(file_info).encode('utf-8')
+            digests[file_info['path']] = (ContentManifest.digest(data), file_info)
+        return digests
+
+    def _preview(self, file_info: Dict[str, any]) -> str:
+        # Prefer the index so previews match whether or not content was rendered (or cached)
+        if self.index is None:
+            head = file_info['content']
+        else:
+            head = self.index.head(file_info['section'], 100)
+            if file_info['route'].rewrite:
+                head = file_info['route'].rewrite(head)
+        content_preview = head[:100].replace('\n', '\\n')
+        if file_info['size'] > 100:
+            content_preview += "..."
+        return content_preview
+
+    def _write_file(self, file_info: Dict[str, any], created_dirs: set):
+        """Create (or report) a single file and its parent directory.
+
+        Safe to call from several writer threads at once.
+        """
+        file_path = Path(file_info['path'])
+
+        data = None
+        if not self.dry_run:
+            data = self.content(file_info).encode('utf-8')
+            # Leave byte-identical files (and their mtimes) untouched
+            route = file_info['route']
+            if route.manifest and route.manifest.check(os.path.relpath(file_path, route.output_dir), data):
+                with self._lock:
+                    self.unchanged_count += 1
+                self.report.emit(Reporter.DETAIL, f"Unchanged file: {file_path}",
+                                 'file', action='unchanged', path=str(file_path))
+                if self.metrics:
+                    self.metrics.add('files_unchanged')
+                return
+
+        # Create any missing parent directories (already planned when all files are known)
+        dir_path = os.path.dirname(file_info['path'])
+        if dir_path not in created_dirs:
+            with self._lock:
+                self._make_dirs(self._parent_dirs(file_info), created_dirs)
+
+        # Create file
+        if self.dry_run:
+            text = None
+            # Previews are only worth building when they are printed
+            if self.report.verbose:
+                text = (f"[DRY RUN] Would create file: {file_path}\n"
+                        f"          Size: {file_info['size']} bytes\n"
+                        f"          Preview: {self._preview(file_info)}\n"
+                        f"          Source line: {file_info['line_start']}\n")
+            self.report.emit(Reporter.DETAIL, text, 'file', action='would_create', path=str(file_path),
+                             size=file_info['size'], line=file_info['line_start'])
+        else:
+            with self._phase('write'):
+                self.sink.write(str(file_path), data)
+                if route.manifest:
+                    route.manifest.stamp(os.path.relpath(file_path, route.output_dir))
+            if self.metrics:
+                self.metrics.add('files_written')
+                self.metrics.add('bytes_written', len(data))
+            self.report.emit(Reporter.DETAIL, f"{self.sink.label} file: {file_path} ({len(data)} bytes)",
+                             'file', action=self.sink.label.lower(), path=str(file_path), size=len(data))
+
+    @staticmethod
+    def _parent_dirs(file_info: Dict[str, any]) -> List[str]:
+        """The output directory and every directory between it and the file, shallowest first."""
+        base = file_info['route'].output_dir
+        dirs = [base] if base else []
+        for part in file_info['section'].path.split('/')[:-1]:
+            base = os.path.join(base, part) if base else part
+            dirs.append(base)
+        return dirs
+
+    def _make_dirs(self, dir_paths: Iterable[str], created_dirs: set):
+        """Create each directory not yet handled in this pass; parents must come first."""
+        for dir_path in dir_paths:
+            if dir_path in created_dirs or dir_path in ('', '.'):
+                continue
+            created_dirs.add(dir_path)
+            if self.dry_run:
+                self.report.emit(Reporter.DETAIL, f"[DRY RUN] Would create directory: {dir_path}",
+                                 'directory', action='would_create', path=dir_path)
+            elif self.sink.make_dir(dir_path):
+                self.report.emit(Reporter.DETAIL, f"{self.sink.label} directory: {dir_path}",
+                                 'directory', action=self.sink.label.lower(), path=dir_path)
+
+    def _begin_writes(self, carry_manifests: bool = False):
+        """Open the sink for a pass; ``carry_manifests`` continues the last pass's manifests (watch mode)."""
+        if not self.dry_run:
+            self.sink.begin(route.output_dir for route in self.routes.values())
+        self._carried_manifests = False
+        if not self.dry_run and self.use_manifest and self.sink.incremental:
+            for route in self.routes.values():
+                if carry_manifests and route.manifest:
+                    route.manifest.carry()
+                    self._carried_manifests = True
+                else:
+                    route.manifest = ContentManifest(route.output_dir)
+                # Staged passes compare against (and prune) the staging copy
+                route.manifest.output_dir = self.sink.working_dir(route.output_dir)
+        self.unchanged_count = 0
+
+    def _finish_writes(self):
+        manifests = [route.manifest for route in self.routes.values() if route.manifest]
+        # Filtered-out sections are still in the bundle: neither forget nor prune their files
+        for prefix, path in self.filtered:
+            route = self.routes[prefix]
+            if route.manifest:
+                route.manifest.keep(os.path.relpath(os.path.join(route.output_dir, path), route.output_dir))
+        # Prune before closing the sink, so a staged tree is complete when it is published
+        for route in self.routes.values():
+            manifest = route.manifest
+            if not manifest:
+                continue
+            removed = manifest.prune() if self.prune else []
+            for file_path in removed:
+                self.report.emit(Reporter.DETAIL, f"Removed stale file: {file_path}",
+                                 'file', action='removed', path=str(file_path))
+            # Files this or an earlier run generated; anything else in the tree is untracked
+            self.sink.track(route.output_dir, set(manifest.previous) | set(manifest.current), bool(removed))
+        published = ()
+        if not self.dry_run:
+            self.sink.close()
+            published = getattr(self.sink, 'published', ())
+            for output_dir in published:
+                self.report.emit(Reporter.SUMMARY, f"Published {output_dir} "
+                                                   f"(previous tree: {StagedSink.sibling(output_dir, 'previous')})",
+                                 'publish', path=output_dir)
+            store = getattr(self.sink, 'store', None)
+            if store:
+                self.report.emit(Reporter.SUMMARY, store.summary(), 'blobs', **store.stats)
+        for manifest in manifests:
+            # A publish swapped the manifest files, so the record on disk is no longer the carried one
+            manifest.save(incremental=self._carried_manifests and not published)
+        if manifests and self.unchanged_count:
+            self.report.emit(Reporter.SUMMARY, f"\nSkipped {self.unchanged_count} unchanged files "
+                                               f"(manifest: {', '.join(m.path for m in manifests)})")
+
+    def _abort_writes(self):
+        # Partial archives and staging trees must never be published
+        if not self.dry_run:
+            self.sink.abort()
+
+    def create_files(self):
+        """Create the actual files and directories."""
+        self.report.emit(Reporter.DETAIL,
+                         f"\n{'[DRY RUN] ' if self.dry_run else ''}Processing {len(self.files_to_create)} files...\n")
+        
+        self._begin_writes()
+        created_dirs = set()
+        # Every file is known, so plan all directories from the trie: shallowest
+        # first, each created exactly once, before any file is written
+        self._make_dirs(self.tree.directories(), created_dirs)
+        for file_info in self.files_to_create:
+            self._write_file(file_info, created_dirs)
+        self._finish_writes()
+
+    def stream_files(self) -> int:
+        """Parse and write in a single pass without holding the whole bundle in memory.
+
+        Each file is written as soon as its section closes. Returns the number of files processed.
+        """
+        self.report.emit(Reporter.DETAIL, f"{'[DRY RUN] ' if self.dry_run else ''}Streaming {self.input_file}...\n")
+        self._begin_writes()
+        created_dirs = set()
+        count = 0
+        for file_info in self.iter_files():
+            self._write_file(file_info, created_dirs)
+            count += 1
+        self._finish_writes()
+        return count
+
+    def pipeline_files(self, workers: int = 4, queue_size: int = 64) -> int:
+        """Parse, rewrite and write concurrently, linked by bounded queues.
+
+        The calling thread indexes the bundle, one thread rewrites imports and a
+        pool of ``workers`` threads writes files, so disk latency overlaps with
+        parsing. Index entries are kept in files_to_create for the reports that
+        follow; rendered content is dropped once written. Returns the number of
+        files processed.
+        """
+        self.report.emit(Reporter.DETAIL,
+                         f"{'[DRY RUN] ' if self.dry_run else ''}Pipelining {self.input_file} ({workers} writers)...\n")
+        self._begin_writes()
+        self.index = self._open_index()
+        parsed = queue.Queue(maxsize=queue_size)
+        rendered = queue.Queue(maxsize=queue_size)
+        created_dirs = set()
+        errors = []
+
+        def rewrite_stage():
+            try:
+                while True:
+                    file_info = parsed.get()
+                    if file_info is _DONE:
+                        break
+                    # After a failure keep draining so the parser never blocks
+                    if errors:
+                        continue
+                    try:
+                        file_info['content'] = self._render(self.index, file_info['section'])
+                    except Exception as e:
+                        errors.append(e)
+                        continue
+                    rendered.put(file_info)
+            finally:
+                for _ in range(workers):
+                    rendered.put(_DONE)
+
+        def write_stage():
+            while True:
+                file_info = rendered.get()
+                if file_info is _DONE:
+                    break
+                if errors:
+                    continue
+                try:
+                    self._write_file(file_info, created_dirs)
+                except Exception as e:
+                    errors.append(e)
+                file_info.pop('content', None)
+
+        threads = [threading.Thread(target=rewrite_stage, daemon=True)]
+        threads += [threading.Thread(target=write_stage, daemon=True) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            for section in self._sections(self.index):
+                if errors:
+                    break
+                file_info = self._file_info(section)
+                self.files_to_create.append(file_info)
+                parsed.put(file_info)
+        finally:
+            parsed.put(_DONE)
+            for thread in threads:
+                thread.join()
+        if errors:
+            raise errors[0]
+
+        self._finish_writes()
+        return len(self.files_to_create)
+    
+    def watch(self, interval: float = 0.5):
+        """Re-split whenever the input changes, until interrupted.
+
+        The input is polled for mtime/size changes and read into memory as a
+        snapshot (a mapping of a file rewritten in place can fault). Each pass
+        re-indexes only the stretch of the bundle that changed, see _resplit().
+        """
+        self.report.emit(Reporter.SUMMARY,
+                         f"{'[DRY RUN] ' if self.dry_run else ''}Watching {self.input_file} (Ctrl+C to stop)...")
+        self.report.flush()
+        last_stat = None
+        try:
+            while True:
+                try:
+                    stat = os.stat(self.input_file)
+                    if (stat.st_mtime_ns, stat.st_size) != last_stat:
+                        with open(self.input_file, 'rb') as f:
+                            data = f.read()
+                        after = os.stat(self.input_file)
+                except FileNotFoundError:
+                    # Editors that save by rename briefly remove the file
+                    time.sleep(interval)
+                    continue
+                if (stat.st_mtime_ns, stat.st_size) != last_stat:
+                    if (after.st_mtime_ns, after.st_size) != (stat.st_mtime_ns, len(data)):
+                        # Still being written: read it again on the next poll
+                        time.sleep(interval)
+                        continue
+                    last_stat = (stat.st_mtime_ns, stat.st_size)
+                    try:
+                        self._resplit(data)
+                    except Exception as e:
+                        self._abort_writes()
+                        # The pass may have stopped half way: start the next one from scratch
+                        self._reset_watch()
+                        self.report.emit(Reporter.WARN, f"[ERROR] {e} (last processed line: {self.line_number})",
+                                         'error', message=str(e), line=self.line_number)
+                    self.report.flush()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.report.emit(Reporter.SUMMARY, "\nStopped watching.")
+            self.report.flush()
+
+    def _resplit(self, data: Optional[bytes] = None):
+        """One watch pass over ``data``, a snapshot of the input (read from disk when omitted).
+
+        The bytes before the first change and after the last change are the
+        same as in the previous pass, and so are the sections in them: the ones
+        before are kept as they are, the ones after are kept and shifted. Only
+        the stretch in between is re-indexed and re-validated, and of its
+        sections only those whose raw bytes changed are rewritten.
+        """
+        start = time.perf_counter()
+        if data is None:
+            with open(self.input_file, 'rb') as f:
+                data = f.read()
+        old = self._watch_data
+        if old is None:
+            for route in self.routes.values():
+                route.reset()
+            old = b''
+        sections = self._watch_sections
+        skipped = self._watch_skipped
+
+        # Resume at the last header whose line (prefix included) lies before the first changed byte:
+        # everything above it parses as before, and so does the section above it, which ends there
+        same_head = _common_prefix(old, data)
+        longest = max(len(prefix.encode('utf-8')) for prefix in self.routes)
+        first = _first_section_at(sections, same_head - longest + 1) - 1
+        if first < 0:
+            first, resume, line_number = 0, 0, 0
+        else:
+            resume, line_number = sections[first].header_offset, sections[first].line_start - 1
+        # Stop at the first header (newline before it included) inside the unchanged tail
+        same_tail = _common_suffix(old, data, min(len(old), len(data)) - same_head)
+        last = _first_section_at(sections, len(old) - same_tail + 1)
+        shift = len(data) - len(old)
+        stop = sections[last].header_offset + shift if last < len(sections) else None
+
+        # Take the sections being rescanned back out of the validators and the output
+        dropped: Dict[str, Route] = {}
+        # Paths several sections write to, where the last of them in the bundle wins
+        contested = set()
+        for section in sections[first:last]:
+            route = self.routes[section.prefix]
+            if section.path in route.legacy_paths:
+                continue
+            route.validator.remove(section)
+            if section.has_content:
+                path = os.path.join(route.output_dir, section.path)
+                self._watch_paths[path] -= 1
+                if self._watch_paths[path]:
+                    contested.add(path)
+                else:
+                    del self._watch_paths[path]
+                    dropped[path] = route
+        tail_from = sections[last].header_offset if last < len(sections) else len(old)
+        kept_skipped = [entry for entry in skipped if entry[2] < resume]
+        tail_skipped = [(prefix, path, offset + shift) for prefix, path, offset in skipped if offset >= tail_from]
+        for prefix, path, offset in skipped:
+            if resume <= offset < tail_from:
+                self.routes[prefix].validator.remove_module(path)
+
+        self._begin_writes(carry_manifests=self._watch_data is not None)
+        created_dirs = set()
+        changed = 0
+        with self._open_index(data) as index:
+            for section in self._sections(index, resume, stop, line_number,
+                                          filtered=len(kept_skipped) + len(tail_skipped)):
+                path = os.path.join(self.routes[section.prefix].output_dir, section.path)
+                self._watch_paths[path] = self._watch_paths.get(path, 0) + 1
+                if self._watch_paths[path] > 1:
+                    contested.add(path)
+                elif self._write_changed(index, section, created_dirs):
+                    changed += 1
+            tail = sections[last:]
+            lines = index.line_number - (tail[0].line_start - 1) if tail else 0
+            if shift or lines:
+                for section in tail:
+                    section.shift(shift, lines)
+            self._watch_sections = sections[:first] + index.sections + tail
+            self._watch_skipped = kept_skipped + index.skipped + tail_skipped
+            self.filtered = [(prefix, path) for prefix, path, _ in self._watch_skipped]
+            if contested:
+                winners = {}
+                for section in self._watch_sections:
+                    route = self.routes[section.prefix]
+                    path = os.path.join(route.output_dir, section.path)
+                    if path in contested and section.has_content and section.path not in route.legacy_paths:
+                        winners[path] = section
+                changed += sum(self._write_changed(index, section, created_dirs) for section in winners.values())
+        self._watch_data = data
+
+        removed = [path for path in dropped if path not in self._watch_paths]
+        for path in removed:
+            del self._watch_digests[path]
+            route = dropped[path]
+            if route.manifest:
+                route.manifest.discard(os.path.relpath(path, route.output_dir))
+        self._finish_writes()
+
+        elapsed = (time.perf_counter() - start) * 1000
+        self.report.emit(Reporter.SUMMARY, f"[{time.strftime('%H:%M:%S')}] {changed} changed, {len(removed)} removed, "
+                                           f"{len(self._watch_paths)} sections ({elapsed:.1f} ms)",
+                         'pass', changed=changed, removed=len(removed), sections=len(self._watch_paths),
+                         ms=round(elapsed, 1))
+        # Only repeat validation results when they change between passes
+        issues = [issue for route in self.routes.values() for issue in route.validator.issues()]
+        if issues != self._watch_issues:
+            for issue in issues:
+                self.report.emit(Reporter.WARN, f"  - {issue}", 'issue', message=issue)
+            self._watch_issues = issues
+
+    def _write_changed(self, index: SectionIndex, section: Section, created_dirs: set) -> bool:
+        """Write a watched section unless its raw content is what was last written to its path."""
+        file_info = self._file_info(section)
+        digest = index.digest(section)
+        if self._watch_digests.get(file_info['path']) == digest:
+            return False
+        self._watch_digests[file_info['path']] = digest
+        file_info['content'] = self._render(index, section)
+        self._write_file(file_info, created_dirs)
+        return True
+
+    def analyze_structure(self):
+        """Analyze and display the project structure that would be created."""
+        report = self.report
+        report.emit(Reporter.SUMMARY, f"\n{'[DRY RUN] ' if self.dry_run else ''}Project Structure Analysis:")
+        report.emit(Reporter.SUMMARY, "=" * 60)
+        
+        # One bottom-up pass fills in per-directory file counts, sizes and types
+        tree = self.tree
+        tree.rollup()
+        directories = 0
+        if tree.files:
+            # Files split with an empty output directory sit above every directory node
+            report.emit(Reporter.DETAIL, "(root)/")
+        for depth, name, path, node in tree.walk():
+            if node is None:
+                report.emit(Reporter.DETAIL, f"{'  ' * depth}{name}" if depth else f"  {name}")
+                continue
+            directories += 1
+            if report.wants(Reporter.DETAIL):
+                types = ', '.join(f"{ext} {count}" for ext, count in sorted(node.extensions.items()))
+                report.emit(Reporter.DETAIL,
+                            f"{'  ' * depth}{name}/  ({node.file_count} file(s), {node.size:,} bytes: {types})",
+                            'tree', path=path, files=node.file_count, bytes=node.size, file_types=node.extensions)
+        
+        # Summary statistics
+        report.emit(Reporter.SUMMARY, "\nSummary:", 'structure', files=len(self.files_to_create),
+                    directories=directories, bytes=tree.size, file_types=tree.extensions)
+        report.emit(Reporter.SUMMARY, f"  Total files: {len(self.files_to_create)}")
+        report.emit(Reporter.SUMMARY, f"  Total directories: {directories}")
+        report.emit(Reporter.SUMMARY, f"  Total size: {tree.size:,} bytes")
+        
+        report.emit(Reporter.SUMMARY, "\nFile types:")
+        for ext, count in sorted(tree.extensions.items()):
+            report.emit(Reporter.SUMMARY, f"  {ext}: {count} file(s)")
+    
+    def validate_extraction(self):
+        """Validate the extraction for potential issues."""
+        report = self.report
+        # Checks ran incrementally while the bundle was indexed
+        issues = [issue for route in self.routes.values() for issue in route.validator.issues()]
+        
+        # Quiet runs still show the heading above any warnings
+        level = Reporter.WARN if issues else Reporter.SUMMARY
+        report.emit(level, f"\n{'[DRY RUN] ' if self.dry_run else ''}Validation Results:")
+        report.emit(level, "=" * 60)
+        
+        if issues:
+            report.emit(Reporter.WARN, "[WARN] Issues found:")
+            for issue in issues:
+                report.emit(Reporter.WARN, f"  - {issue}", 'issue', message=issue)
+        else:
+            report.emit(Reporter.SUMMARY, "[OK] No issues found!")
+    
+    def run(self):
+        """Execute the splitting process."""
+        try:
+            if self.stream:
+                # Constant-memory mode: no structure analysis or whole-bundle validation
+                file_count = self.stream_files()
+            elif self.workers:
+                # Reports run after the overlapped parse/rewrite/write phase
+                file_count = self.pipeline_files(self.workers)
+                with self._phase('analyze'):
+                    self.analyze_structure()
+                with self._phase('validate'):
+                    self.validate_extraction()
+            else:
+                self.parse_file()
+                with self._phase('analyze'):
+                    self.analyze_structure()
+                with self._phase('validate'):
+                    self.validate_extraction()
+                self.create_files()
+                file_count = len(self.files_to_create)
+            
+            if self.dry_run:
+                self.report.emit(Reporter.SUMMARY, f"\n[DRY RUN COMPLETE] No files were created.")
+                self.report.emit(Reporter.SUMMARY, f"To actually create the files, pass --create")
+            else:
+                self.report.emit(Reporter.SUMMARY,
+                                 f"\n[OK] Successfully created {file_count - self.unchanged_count} files!")
+            self.report.emit(Reporter.SUMMARY, None, 'done', files=file_count, unchanged=self.unchanged_count,
+                             dry_run=self.dry_run)
+            return file_count
+                
+        except Exception as e:
+            self._abort_writes()
+            self.report.emit(Reporter.WARN, f"\n[ERROR] {e}", 'error', message=str(e), line=self.line_number)
+            if self.line_number:
+                self.report.emit(Reporter.WARN, f"   Last processed line: {self.line_number}")
+            raise
+        except KeyboardInterrupt:
+            self._abort_writes()
+            raise
+        finally:
+            self.report.flush()
+            if self.index:
+                self.index.close()
+
+
+def add_common_arguments(parser: argparse.ArgumentParser):
+    """Register the options shared by every splitter front end."""
+    parser.add_argument(
+        '--route',
+        action='append',
+        nargs=2,
+        default=[],
+        metavar=('HEADER_PREFIX', 'OUTPUT_DIR'),
+        help='Also split sections under HEADER_PREFIX into OUTPUT_DIR in the same pass; may be repeated'
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        default=True,
+        help='Show what would be created without creating files (default: True)'
+    )
+    parser.add_argument(
+        '--create',
+        action='store_true',
+        help='Actually create the files (overrides --dry-run)'
+    )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Write each file as soon as its section closes (constant memory, skips analysis/validation)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=0,
+        metavar='N',
+        help='Overlap parsing, import rewriting and writing with N writer threads (default: 0, sequential)'
+    )
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Keep running and re-split only the sections that change when the input is saved'
+    )
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=0.5,
+        help='Polling interval in seconds for --watch (default: 0.5)'
+    )
+    parser.add_argument(
+        '--archive',
+        metavar='PATH',
+        help='Write everything into one .tar, .tar.gz/.tgz or .zip archive instead of a directory tree '
+             '("-" streams a tar to stdout)'
+    )
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument(
+        '--quiet',
+        action='store_const',
+        dest='report',
+        const='quiet',
+        default='verbose',
+        help='Print only warnings and errors'
+    )
+    output.add_argument(
+        '--summary',
+        action='store_const',
+        dest='report',
+        const='summary',
+        help='Print totals and validation results without per-file lines'
+    )
+    output.add_argument(
+        '--json-lines',
+        action='store_const',
+        dest='report',
+        const='json-lines',
+        help='Print one JSON object per event (file, directory, issue, ...) for tooling'
+    )
+    parser.add_argument(
+        '--include',
+        action='append',
+        default=[],
+        metavar='GLOB',
+        help='Only extract section paths matching GLOB, e.g. "src/utils/**"; may be repeated'
+    )
+    parser.add_argument(
+        '--exclude',
+        action='append',
+        default=[],
+        metavar='GLOB',
+        help='Skip section paths matching GLOB, e.g. "**/*.test.ts"; may be repeated'
+    )
+    parser.add_argument(
+        '--filter-file',
+        metavar='PATH',
+        help='JSON file with "include" and/or "exclude" glob lists, merged with --include/--exclude'
+    )
+    parser.add_argument(
+        '--blob-store',
+        metavar='DIR',
+        help='Write each distinct file once into a content-addressed store in DIR and hard-link it into '
+             'the output (reflink or copy across filesystems); linked files are read-only'
+    )
+    parser.add_argument(
+        '--staged',
+        action='store_true',
+        help='Write into a sibling <dir>.staging tree and publish it with one rename, '
+             'keeping the replaced tree as <dir>.previous'
+    )
+    parser.add_argument(
+        '--rollback',
+        action='store_true',
+        help='Swap the output directory back to the tree kept by the last --staged run, then exit'
+    )
+    parser.add_argument(
+        '--metrics-json',
+        metavar='PATH',
+        help='Write per-phase timings, byte/section counts and rewrite statistics to PATH as JSON'
+    )
+    parser.add_argument(
+        '--profile',
+        metavar='PATH',
+        help='Run under cProfile and dump the stats to PATH (inspect with python -m pstats)'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Always re-parse the bundle instead of reusing the parse cache'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        metavar='DIR',
+        help=f'Parse cache location (default: {ParseCache.default_dir()})'
+    )
+    parser.add_argument(
+        '--no-manifest',
+        action='store_true',
+        help='Rewrite every file instead of skipping ones unchanged since the last run'
+    )
+    parser.add_argument(
+        '--prune',
+        action='store_true',
+        help='Delete previously generated files that are no longer in the bundle'
+    )
+
+
+def splitter_options(args: argparse.Namespace) -> Dict[str, any]:
+    """Translate parsed common arguments into BundleSplitter keyword arguments."""
+    # If --create is specified, turn off dry-run
+    if args.create:
+        args.dry_run = False
+    if args.archive and (args.watch or args.prune or args.staged or args.blob_store):
+        raise SystemExit("--archive cannot be combined with --watch, --prune, --staged or --blob-store")
+    sink = None
+    if not args.dry_run:
+        store = BlobStore(args.blob_store) if args.blob_store else None
+        if args.archive:
+            sink = open_sink(args.archive)
+        elif args.staged:
+            sink = StagedSink(store)
+        elif store:
+            sink = DirectorySink(store)
+    return {
+        'sink': sink,
+        'dry_run': args.dry_run,
+        'stream': args.stream,
+        'use_manifest': not args.no_manifest,
+        'prune': args.prune,
+        'workers': args.workers,
+        # Keep a tar stream on stdout clean: console output goes to stderr instead
+        'reporter': Reporter(args.report, stream=sys.stderr if args.archive == '-' else None),
+        'cache': None if args.no_cache else ParseCache(args.cache_dir),
+        'path_filter': PathFilter.from_args(args),
+    }
+
+
+def extra_routes(args: argparse.Namespace) -> List[Route]:
+    return [default_route(prefix, output_dir) for prefix, output_dir in args.route]
+
+
+def run_splitter(splitter: BundleSplitter, args: argparse.Namespace):
+    """Run (or watch) a splitter as the command line asked, with optional metrics and profiling."""
+    if args.rollback:
+        for route in splitter.routes.values():
+            if rollback_tree(route.output_dir):
+                print(f"[OK] Rolled {route.output_dir} back to the previously published tree")
+            else:
+                print(f"[WARN] No previous tree for {route.output_dir}")
+        return
+    if args.watch:
+        splitter.watch(args.interval)
+        return
+    if args.metrics_json:
+        splitter.metrics = Metrics()
+        splitter.metrics.add('input_bytes', os.path.getsize(splitter.input_file))
+    profiler = cProfile.Profile() if args.profile else None
+    try:
+        if profiler:
+            profiler.runcall(splitter.run)
+        else:
+            splitter.run()
+    finally:
+        if profiler:
+            profiler.dump_stats(args.profile)
+        if splitter.metrics:
+            mode = 'stream' if splitter.stream else 'pipeline' if splitter.workers else 'sequential'
+            splitter.metrics.write_json(args.metrics_json, input_file=splitter.input_file, mode=mode,
+                                        dry_run=splitter.dry_run)